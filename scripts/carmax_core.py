@@ -0,0 +1,859 @@
+"""
+Shared CarMax scraping core.
+
+Holds everything needed to turn a query into CarMax listings: the
+structured-query adapter, URL building with the filter catalog, tile
+extraction and the scrape itself. scrape-carmax.py is the CLI wrapper and
+scrape-cars-multisite.py reuses scrape_carmax with its own browser.
+"""
+import asyncio
+import logging
+import os
+import re
+import tempfile
+from functools import lru_cache
+from hashlib import blake2b
+from pathlib import Path
+from typing import Callable, List, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from camoufox.async_api import AsyncCamoufox
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# Import model name mappings
+from model_mappings import normalize_models_for_site
+from scraper_common import ResultsCache, block_unneeded_resources, extract_number, json_loads
+
+# Filter catalog path
+FILTER_CATALOG_PATH = Path(__file__).parent / 'data' / 'carmax-filters.json'
+
+# Cache for filter catalog: (mtime_ns or None if missing, catalog)
+_filter_catalog = None
+
+# On-disk cache of scrape results keyed by canonical search URL and search
+# argument. Opt-in: set CARMAX_CACHE_TTL to a number of seconds (e.g. 300)
+# to answer repeat searches from it; by default every run scrapes live.
+RESULTS_CACHE = ResultsCache(
+    Path(tempfile.gettempdir()) / 'neon-carmax-cache',
+    int(os.environ.get('CARMAX_CACHE_TTL', '0')),
+    label='[CarMax] ',
+)
+# Query params that only restate CarMax defaults and don't change the results
+DEFAULT_QUERY_PARAMS = frozenset({('showreservedcars', 'false'), ('price', '-'), ('price', '')})
+
+# CarMax shows this many tiles per results page; bigger requests read up to
+# MAX_RESULT_PAGES pages at once
+CARMAX_PAGE_SIZE = 24
+MAX_RESULT_PAGES = 3
+
+# Camoufox's humanized cursor adds latency to every interaction and the scrape
+# doesn't interact with the page, so it's off unless CARMAX_HUMANIZE is set or
+# a bot challenge is hit
+HUMANIZE = bool(os.environ.get('CARMAX_HUMANIZE', ''))
+# Markers of a Cloudflare interstitial, checked in the page after navigation
+CHALLENGE_JS = """() => document.title.includes('Just a moment')
+    || !!document.querySelector('[id^="cf-chl"], [class*="cf-chl"], script[src*="challenge-platform"]')"""
+
+# Patterns applied to every tile
+NAME_RE = re.compile(r'(20\d{2}\s+.+?)(?=\n|$)', re.IGNORECASE)
+MILEAGE_RE = re.compile(r'(\d+K?)\s*mi', re.IGNORECASE)
+LOCATION_RE = re.compile(r'CarMax\s+([^,]+),\s*([A-Z]{2})')
+# Page copy shown when a search has no matches, scanned in a single regex pass
+NO_RESULTS_INDICATORS = (
+    'No matching vehicles',
+    'No results found',
+    '0 results',
+    'No cars found',
+    'Try changing your search',
+    'No exact matches',
+)
+NO_RESULTS_RE = re.compile('|'.join(map(re.escape, NO_RESULTS_INDICATORS)))
+NO_RESULTS_JS = "(pattern) => new RegExp(pattern).test(document.body ? document.body.innerText : '')"
+# Resolves once tiles render ('tiles') or no-results copy shows ('empty'); polled
+# rather than per-frame since innerText forces a layout
+PAGE_READY_JS = """(pattern) => document.querySelector('.kmx-car-tile') ? 'tiles'
+    : (new RegExp(pattern).test(document.body ? document.body.innerText : '') ? 'empty' : null)"""
+
+# One 'Key: value' pair of data-clickprops; values run to the next comma
+CLICKPROPS_PAIR_RE = re.compile(r'\s*([^:,]+?)\s*:\s*([^,]*)')
+
+
+def adapt_structured_to_carmax(structured: dict) -> dict:
+    """
+    Convert structured query format to CarMax-specific parameters.
+
+    The structured format is the universal format output by parse_vehicle_query.py.
+    Each scraper has its own adapter to convert this to scraper-specific params.
+
+    Args:
+        structured: The structured query dict with keys like makes, models, trims, etc.
+
+    Returns:
+        CarMax-specific parameter dict compatible with build_carmax_url()
+    """
+    params = {}
+
+    # Make/Model pairs (CarMax supports multiple)
+    makes = structured.get('makes', [])
+    models = structured.get('models', [])
+    if makes and models:
+        # Normalize model names for CarMax (e.g., Sierra 3500HD -> Sierra 3500)
+        models = normalize_models_for_site(models, 'carmax')
+        # Ensure equal length - zip to pairs
+        min_len = min(len(makes), len(models))
+        params['makes'] = makes[:min_len]
+        params['models'] = models[:min_len]
+
+    # Trims (make/model specific)
+    if structured.get('trims'):
+        params['trims'] = structured['trims']
+
+    # Colors (exterior or interior - CarMax treats both as colors)
+    colors = []
+    if structured.get('exteriorColor'):
+        colors.append(structured['exteriorColor'])
+    if structured.get('interiorColor'):
+        colors.append(structured['interiorColor'])
+    if colors:
+        params['colors'] = colors
+
+    # Body type (global filter)
+    if structured.get('bodyType'):
+        params['body_type'] = structured['bodyType']
+
+    # Fuel type (global filter)
+    if structured.get('fuelType'):
+        params['fuel_type'] = structured['fuelType']
+
+    # Drivetrain (global filter)
+    if structured.get('drivetrain'):
+        params['drivetrain'] = structured['drivetrain']
+
+    # Transmission
+    if structured.get('transmission'):
+        params['transmission'] = structured['transmission']
+
+    # Car size
+    if structured.get('carSize'):
+        params['car_size'] = structured['carSize']
+
+    # Doors
+    if structured.get('doors'):
+        params['doors'] = structured['doors']
+
+    # Cylinders
+    if structured.get('cylinders'):
+        params['cylinders'] = structured['cylinders']
+
+    # Features (array - CarMax supports chaining)
+    if structured.get('features'):
+        params['features'] = structured['features']
+
+    # Price range
+    if structured.get('minPrice') is not None:
+        params['min_price'] = structured['minPrice']
+    if structured.get('maxPrice') is not None:
+        params['max_price'] = structured['maxPrice']
+
+    # Year handling - CarMax doesn't have year filters in URL,
+    # but we can note it for post-filtering results
+    # (not implemented here)
+
+    return params
+
+
+def load_filter_catalog() -> dict:
+    """
+    Load the CarMax filter catalog.
+
+    The parsed catalog is cached alongside the file's mtime, so a regenerated
+    catalog is picked up on the next call without restarting the process.
+    """
+    global _filter_catalog
+    try:
+        mtime = FILTER_CATALOG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    if _filter_catalog is not None and _filter_catalog[0] == mtime:
+        return _filter_catalog[1]
+
+    if mtime is None:
+        # Return empty catalog if file doesn't exist
+        catalog = {'filters': {}}
+    else:
+        raw = FILTER_CATALOG_PATH.read_bytes()
+        catalog = json_loads(raw)
+
+    _filter_catalog = (mtime, catalog)
+    return catalog
+
+
+def get_filters_for_model(make: str, model: str) -> dict:
+    """Get available filters for a specific make/model."""
+    catalog = load_filter_catalog()
+    make = make.lower().replace(' ', '-').replace('land-rover', 'land-rover')
+    model = model.lower().replace(' ', '-')
+
+    return catalog.get('filters', {}).get(make, {}).get(model, {
+        'trims': [],
+        'colors': [],
+        'drivetrains': [],
+        'features': [],
+        'fuel_types': []
+    })
+
+
+@lru_cache(maxsize=4096)
+def slugify(value: str) -> str:
+    """Convert a value to URL-friendly slug format."""
+    return value.lower().replace(' ', '-').replace('_', '-')
+
+
+def get_global_filters() -> dict:
+    """Get global filter options (agnostic of make/model)."""
+    catalog = load_filter_catalog()
+    return catalog.get('global_filters', {
+        'body_types': [], 'fuel_types': [], 'drivetrains': [],
+        'transmissions': [], 'exterior_colors': [], 'interior_colors': [],
+        'car_sizes': [], 'doors': [], 'cylinders': [], 'features': []
+    })
+
+
+@lru_cache(maxsize=1024)
+def _build_carmax_url_cached(
+    makes: Optional[Tuple[str, ...]],
+    models: Optional[Tuple[str, ...]],
+    trims: Optional[Tuple[str, ...]],
+    colors: Optional[Tuple[str, ...]],
+    body_type: Optional[str],
+    fuel_type: Optional[str],
+    drivetrain: Optional[str],
+    transmission: Optional[str],
+    car_size: Optional[str],
+    doors: Optional[str],
+    cylinders: Optional[str],
+    features: Optional[Tuple[str, ...]],
+    min_price: Optional[int],
+    max_price: Optional[int],
+    show_reserved: bool
+) -> str:
+    """Memoized body of build_carmax_url; list arguments arrive as tuples so they hash."""
+    parts = ['cars']
+
+    # Add make/model/trim if provided (CarMax format: /cars/{make}/{trim}/{model})
+    if makes and models:
+        for make, model in zip(makes, models):
+            parts.append(slugify(make))
+            # Add trim BEFORE model if available
+            if trims and len(trims) > 0:
+                parts.append(slugify(trims[0]))
+            parts.append(slugify(model))
+
+    # Add global filters (CarMax allows chaining these)
+    if body_type:
+        parts.append(slugify(body_type))
+    if fuel_type:
+        parts.append(slugify(fuel_type))
+    if drivetrain:
+        parts.append(slugify(drivetrain))
+    if transmission:
+        parts.append(slugify(transmission))
+    if car_size:
+        parts.append(slugify(car_size))
+    if doors:
+        parts.append(slugify(doors))
+    if cylinders:
+        parts.append(slugify(cylinders))
+    if features:
+        for feature in features:
+            parts.append(slugify(feature))
+
+    # Note: Trims are now added BEFORE model in the make/model section above
+
+    # Add colors (can be exterior or interior)
+    if colors:
+        for color in colors:
+            parts.append(slugify(color))
+
+    # Add query parameters
+    params = []
+    if min_price is not None or max_price is not None:
+        # A price of 0 is a real bound, so only None means "unset"
+        min_str = '' if min_price is None else str(min_price)
+        max_str = '' if max_price is None else str(max_price)
+        if min_str and max_str:
+            params.append(f"price={min_str}-{max_str}")
+        elif max_str:
+            params.append(f"price={max_str}")
+        elif min_str:
+            params.append(f"price={min_str}-")
+
+    params.append(f"showreservedcars={'true' if show_reserved else 'false'}")
+
+    # urlunsplit leaves out the '?' when the query is empty
+    return urlunsplit(('https', 'www.carmax.com', '/' + '/'.join(parts), '&'.join(params), ''))
+
+
+def build_carmax_url(
+    makes: Optional[List[str]] = None,
+    models: Optional[List[str]] = None,
+    trims: Optional[List[str]] = None,
+    colors: Optional[List[str]] = None,
+    body_type: Optional[str] = None,
+    fuel_type: Optional[str] = None,
+    drivetrain: Optional[str] = None,
+    transmission: Optional[str] = None,
+    car_size: Optional[str] = None,
+    doors: Optional[str] = None,
+    cylinders: Optional[str] = None,
+    features: Optional[List[str]] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    show_reserved: bool = False
+) -> str:
+    """
+    Build a CarMax URL with multiple makes/models and global filters.
+
+    CarMax URL format (CRITICAL: trim comes BEFORE model!):
+    /cars/{make}/{trim}/{model}/{body_type}/{fuel_type}/{feature}/{color}?price={min}-{max}&showreservedcars={true|false}
+
+    Examples:
+    - Single make/model: /cars/gmc/sierra-3500?showreservedcars=false
+    - With trim: /cars/gmc/denali-ultimate/sierra-3500?showreservedcars=false
+    - Multiple makes: /cars/gmc/sierra-3500/ford/f-150?showreservedcars=false
+    - With body type: /cars/suv?showreservedcars=false
+    - With features: /cars/gmc/denali/sierra-3500/seat-massagers/sunroof?showreservedcars=false
+    - Complex: /cars/gmc/denali-ultimate/sierra-3500/black/four-wheel-drive?price=20000-40000&showreservedcars=false
+    """
+    def as_tuple(values: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+        return tuple(values) if values is not None else None
+
+    return _build_carmax_url_cached(
+        as_tuple(makes), as_tuple(models), as_tuple(trims), as_tuple(colors),
+        body_type, fuel_type, drivetrain, transmission, car_size, doors, cylinders,
+        as_tuple(features), min_price, max_price, show_reserved
+    )
+
+
+# Collects every main-results tile in a single page.evaluate. Tiles inside the
+# recommendations section (or an empty-page "Cars we think you'll like" block)
+# are dropped, then the rest are capped at maxResults and flattened to plain
+# strings so the Python side never has to go back to the browser. NAME_RE and
+# LOCATION_RE run in the page, so only their matches cross CDP, not each
+# tile's full text. Called through read_tile_rows.
+TILE_ROWS_JS = '''
+({maxResults, namePattern, locationPattern}) => {
+    const nameRe = new RegExp(namePattern, 'i');
+    const locationRe = new RegExp(locationPattern);
+
+    // Tiles share a handful of containers, so scan each container's headings once
+    const containerVerdicts = new Map();
+    const hasRecommendationHeading = (container) => {
+        for (const h of container.querySelectorAll('h5, h4, h3, h2')) {
+            const text = h.textContent.toLowerCase();
+            if (text.includes('cars we think') ||
+                text.includes('recommend') ||
+                text.includes('you might also like') ||
+                text.includes('similar vehicles')) {
+                return true;
+            }
+        }
+        return false;
+    };
+
+    const isRecommendation = (element) => {
+        // Case 1: Standard recommendations section
+        if (element.closest('section[aria-label="recommendations"]')) return true;
+
+        // Case 2: Empty page recommendations with heading text
+        const container = element.closest('div, section');
+        if (!container) return false;
+        if (!containerVerdicts.has(container)) {
+            containerVerdicts.set(container, hasRecommendationHeading(container));
+        }
+        return containerVerdicts.get(container);
+    };
+
+    const tiles = Array.from(document.querySelectorAll('.kmx-car-tile'));
+    const mainTiles = tiles.filter(tile => !isRecommendation(tile));
+
+    return {
+        total: tiles.length,
+        kept: mainTiles.length,
+        rows: mainTiles.slice(0, maxResults).map(tile => {
+            const link = tile.querySelector('a[href*="/car/"]');
+            const priceElem = tile.querySelector('[class*="price"]');
+            const img = tile.querySelector('img');
+            const text = tile.innerText;
+            const nameMatch = text.match(nameRe);
+            const locationMatch = text.match(locationRe);
+            return {
+                clickprops: tile.getAttribute('data-clickprops'),
+                nameText: nameMatch ? nameMatch[1] : null,
+                location: locationMatch ? [locationMatch[1], locationMatch[2]] : null,
+                linkText: link ? link.innerText : null,
+                href: link ? link.getAttribute('href') : null,
+                priceText: priceElem ? priceElem.innerText : null,
+                image: img ? (img.getAttribute('src') || '') : ''
+            };
+        })
+    };
+}
+'''
+
+
+@lru_cache(maxsize=4096)
+def parse_data_clickprops(props_str: str) -> dict:
+    """Parse CarMax data-clickprops attribute
+    Format: 'Element type: Car Tile,StockNumber: 27818903,YMM: 2018 Honda Civic,Price: 14998,...'
+
+    Cached, so tiles seen again (overlapping pages, repeat queries in --serve
+    mode) skip the parse. The returned dict is shared; don't mutate it.
+    """
+    return {key: value.strip() for key, value in CLICKPROPS_PAIR_RE.findall(props_str)}
+
+
+def parse_tile_row(row: dict, search_arg: str) -> Optional[dict]:
+    """
+    Turn one row from TILE_ROWS_JS into a listing dict.
+
+    Works purely on strings already pulled from the page. Returns None for
+    tiles without a price.
+    """
+    # Method 1: Extract from data-clickprops (most reliable for price/stock)
+    clickprops = row['clickprops']
+    data = parse_data_clickprops(clickprops) if clickprops else {}
+    if data:
+        name = data.get('YMM', search_arg)  # Year Make Model (without trim)
+        price = extract_number(data.get('Price', '0'))
+        stock_number = data.get('StockNumber', '')
+    else:
+        # Fallback: parse from page elements
+        name = row['linkText'] if row['linkText'] is not None else search_arg
+        price = 0
+        stock_number = ''
+
+    # Price is the only field that can reject a tile, so check it before the
+    # URL, name, mileage and location work
+    if price <= 0:
+        return None
+
+    # Extract URL from link element if stock_number not available
+    url = ''
+    if stock_number:
+        url = f"https://www.carmax.com/car/{stock_number}"
+    else:
+        # Fallback: get URL directly from link element
+        url = row['href'] or ''
+        if url and not url.startswith('http'):
+            url = f"https://www.carmax.com{url}"
+
+        # Final fallback: generate a unique URL based on vehicle name to avoid filtering
+        if not url:
+            # Create a unique slug from vehicle name and price to make URL unique
+            name_slug = name.lower().replace(' ', '-').replace('/', '-')[:50]
+            url = f"https://www.carmax.com/cars/all?search={name_slug}-{price}"
+
+    # Get the full vehicle name
+    # The link element has the full name with trim (e.g., "2024 GMC Sierra 3500 Denali Ultimate")
+    # But innerText might return split text, so we need to clean it up
+    # Try the short link text first, else the NAME_RE match the page took from
+    # the whole tile text (typically the first meaningful line before the price)
+    name_match = row['linkText'] and NAME_RE.search(row['linkText'])
+    full_name = name_match.group(1) if name_match else row['nameText']
+    if full_name:
+        full_name = full_name.strip()
+        # Clean up the name (remove extra whitespace)
+        full_name = ' '.join(full_name.split())
+        # Use this if it's longer than what we had
+        if len(full_name) > len(name):
+            name = full_name
+
+    # Get mileage (appears in the price/mileage combo element)
+    text = row['priceText']
+    if text is not None:
+        # Text contains both price and mileage, e.g. "$14,998*\n113K mi"
+        mileage_match = MILEAGE_RE.search(text)
+        mileage = extract_number(mileage_match.group(1)) if mileage_match else 0
+        # If mileage has K, multiply by 1000
+        if mileage_match and 'K' in mileage_match.group(1):
+            mileage = mileage * 1000
+    else:
+        mileage = 0
+
+    # Get image
+    image = row['image']
+
+    # Get location (try multiple approaches)
+    location = 'CarMax'
+    # Prefer the store fields in data-clickprops when the tile carries them
+    store_name = data.get('StoreName') or data.get('StoreLocation')
+    store_state = data.get('StoreState') or data.get('State')
+    if store_name and store_state:
+        location = f"CarMax {store_name}, {store_state}"
+    elif row['location']:
+        # Text like "CarMax Serramonte, CA", matched by LOCATION_RE in the page
+        store_name, store_state = row['location']
+        location = f"CarMax {store_name}, {store_state}"
+
+    logging.error(f"[CarMax] {name[:30]} - ${price:,} - {mileage:,} mi")
+    return {
+        'name': name.strip(),
+        'price': price,
+        'mileage': mileage,
+        'image': image,
+        'retailer': 'CarMax',
+        'url': url,
+        'location': location.strip()
+    }
+
+
+def canonical_key(url: str, search_arg: str) -> str:
+    """
+    Cache key for a CarMax search URL and the search argument behind it.
+
+    URLs that differ only in host case, query param order, a trailing slash,
+    the fragment or default-valued params (showreservedcars=false, an empty
+    price range) map to the same key. search_arg is part of the key because
+    parse_tile_row uses it as the fallback listing name.
+    """
+    parts = urlsplit(url)
+    query = sorted(
+        (key.lower(), value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if (key.lower(), value.lower()) not in DEFAULT_QUERY_PARAMS
+    )
+    canonical = urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip('/').lower(),
+        urlencode(query),
+        '',
+    ))
+    return blake2b(f"{canonical}\n{search_arg}".encode()).hexdigest()
+
+
+def resolve_search_url(search_arg: str, search_filters: dict = None) -> str:
+    """Turn a search argument (URL, filters or free text) into the CarMax search URL."""
+    # Build URL based on search filters or use provided URL
+    if search_arg.startswith('http'):
+        # Direct URL provided
+        search_url = search_arg
+        logging.error(f"[CarMax] Using structured URL: {search_url}")
+    elif search_filters:
+        # Build URL from search filters (supports global filters + makes/models)
+        makes = search_filters.get('makes', [])
+        models = search_filters.get('models', [])
+        # Normalize model names for CarMax (e.g., Sierra 3500HD -> Sierra 3500)
+        models = normalize_models_for_site(models, 'carmax')
+
+        # Ensure equal length for makes/models if both provided
+        if makes and models:
+            min_len = min(len(makes), len(models))
+            makes = makes[:min_len]
+            models = models[:min_len]
+
+        # Extract all filter parameters
+        trims = search_filters.get('trims', [])
+        colors = search_filters.get('colors', [])
+        body_type = search_filters.get('bodyType')
+        fuel_type = search_filters.get('fuelType')
+        drivetrain = search_filters.get('drivetrain')
+        transmission = search_filters.get('transmission')
+        car_size = search_filters.get('carSize')
+        doors = search_filters.get('doors')
+        cylinders = search_filters.get('cylinders')
+        features = search_filters.get('features', [])
+        min_price = search_filters.get('minPrice')
+        max_price = search_filters.get('maxPrice')
+
+        # Build URL with all applicable filters
+        search_url = build_carmax_url(
+            makes=makes if makes else None,
+            models=models if models else None,
+            trims=trims if trims else None,
+            colors=colors if colors else None,
+            body_type=body_type,
+            fuel_type=fuel_type,
+            drivetrain=drivetrain,
+            transmission=transmission,
+            car_size=car_size,
+            doors=doors,
+            cylinders=cylinders,
+            features=features if features else None,
+            min_price=min_price,
+            max_price=max_price,
+            show_reserved=False
+        )
+        logging.error(f"[CarMax] Built URL from filters: {search_url}")
+    else:
+        # Fallback to text search
+        search_url = f"https://www.carmax.com/cars/all?search={search_arg.replace(' ', '+')}"
+        logging.error(f"[CarMax] Searching for: {search_arg}")
+    return search_url
+
+
+async def launch_browser(humanize: bool = None):
+    """Start a Camoufox browser for scraping; humanize defaults to HUMANIZE."""
+    if humanize is None:
+        humanize = HUMANIZE
+    # IMPORTANT: headless=False because camoufox crashes in headless mode
+    return await AsyncCamoufox(headless=False, humanize=humanize).__aenter__()
+
+
+async def new_scrape_page(browser):
+    """Open a page in browser with unneeded resources blocked."""
+    page = await browser.new_page()
+    await page.route('**/*', block_unneeded_resources)
+    return page
+
+
+async def open_search_page(browser, search_url: str):
+    """Open search_url in a new page of browser."""
+    page = await new_scrape_page(browser)
+    try:
+        await page.goto(search_url, wait_until='domcontentloaded', timeout=60000)
+    except BaseException:
+        # Also on cancellation, so parallel page loads don't leak tabs
+        await page.close()
+        raise
+    return page
+
+
+class PagePool:
+    """
+    A fixed set of warm pages on one browser, each used by one scrape at a time.
+
+    Saves the browser launch and page setup on every query after the first.
+    Pages are created on start(); acquire() waits until one is free.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.browser = None
+        self._pages = asyncio.Queue()
+
+    async def start(self):
+        self.browser = await launch_browser()
+        for _ in range(self.size):
+            self._pages.put_nowait(await new_scrape_page(self.browser))
+
+    async def acquire(self):
+        return await self._pages.get()
+
+    def release(self, page) -> None:
+        self._pages.put_nowait(page)
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+
+
+def paged_url(search_url: str, page_number: int) -> str:
+    """search_url pointed at results page page_number (1-based)."""
+    parts = urlsplit(search_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'page']
+    query.append(('page', str(page_number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+async def wait_for_tiles(page) -> Optional[str]:
+    """
+    Wait until tiles render or the page says there are no results.
+
+    Returns 'tiles', 'empty' (no-results copy seen) or None on timeout.
+    """
+    try:
+        ready = await page.wait_for_function(
+            PAGE_READY_JS, arg=NO_RESULTS_RE.pattern, timeout=15000, polling=250
+        )
+        state = await ready.json_value()
+    except PlaywrightTimeoutError:
+        logging.error("[CarMax] Timeout waiting for car tiles - may be no results")
+        return None
+    if state == 'tiles':
+        # Give late tiles a short, bounded chance to settle
+        try:
+            await page.wait_for_load_state('networkidle', timeout=3000)
+        except PlaywrightTimeoutError:
+            pass
+    return state
+
+
+async def read_tile_rows(page, max_results: int) -> dict:
+    """Run TILE_ROWS_JS on page: {total, kept, rows} for up to max_results main tiles."""
+    return await page.evaluate(TILE_ROWS_JS, {
+        'maxResults': max_results,
+        'namePattern': NAME_RE.pattern,
+        'locationPattern': LOCATION_RE.pattern,
+    })
+
+
+async def read_extra_page(browser, url: str, max_results: int) -> List[Dict]:
+    """Tile rows from one additional results page; [] if it fails to load."""
+    try:
+        page = await open_search_page(browser, url)
+    except Exception as e:
+        logging.error(f"[CarMax] Could not load {url}: {e}")
+        return []
+    try:
+        if await wait_for_tiles(page) != 'tiles':
+            return []
+        return (await read_tile_rows(page, max_results))['rows']
+    except Exception as e:
+        logging.error(f"[CarMax] Could not read {url}: {e}")
+        return []
+    finally:
+        await page.close()
+
+
+async def scrape_carmax(search_arg: str, max_results: int = 10, search_filters: dict = None, browser=None,
+                        on_listing: Optional[Callable[[dict], None]] = None, page=None):
+    """
+    Scrape CarMax listings.
+
+    When a page is passed in (e.g. from a PagePool) it is navigated to the
+    search and left open for reuse. When a browser is passed in it is shared:
+    the scrape runs in its own page (and therefore its own context) which is
+    closed afterwards, leaving the browser running. Otherwise a browser is
+    launched and closed for this call.
+    on_listing, if given, is called with each listing as soon as it is parsed.
+    """
+    search_url = resolve_search_url(search_arg, search_filters)
+
+    # Identical searches within the TTL are answered without touching a browser
+    cache_key = canonical_key(search_url, search_arg)
+    cached = RESULTS_CACHE.load(cache_key, max_results)
+    if cached is not None:
+        logging.error(f"[CarMax] Cache hit, returning {len(cached)} cached results")
+        if on_listing:
+            for listing in cached:
+                on_listing(listing)
+        return cached
+
+    results = []
+
+    owns_page = page is None
+    owns_browser = owns_page and browser is None
+    extra_pages = []
+    if owns_browser:
+        browser = await launch_browser()
+
+    try:
+        if owns_page:
+            page = await open_search_page(browser, search_url)
+        else:
+            await page.goto(search_url, wait_until='domcontentloaded', timeout=60000)
+
+        # Retry once in a humanized browser of our own if CarMax served a challenge
+        if not HUMANIZE and await page.evaluate(CHALLENGE_JS):
+            logging.error("[CarMax] Bot challenge detected, retrying with humanize enabled")
+            if owns_page:
+                await page.close()
+            page = None
+            if owns_browser:
+                await browser.close()
+            browser = await launch_browser(humanize=True)
+            owns_browser = owns_page = True
+            page = await open_search_page(browser, search_url)
+
+        # Requests bigger than one results page load the following pages in
+        # parallel tabs while the first one renders
+        if owns_page:
+            page_count = min(MAX_RESULT_PAGES, -(-max_results // CARMAX_PAGE_SIZE))
+            extra_pages = [
+                asyncio.create_task(read_extra_page(browser, paged_url(search_url, n), max_results))
+                for n in range(2, page_count + 1)
+            ]
+
+        # Wait for listings to load - returns as soon as the first tile renders,
+        # or as soon as the page says there are no results
+        page_state = await wait_for_tiles(page)
+
+        # Read every tile in one page.evaluate instead of ~6 round-trips per tile
+        tile_data = await read_tile_rows(page, max_results)
+        logging.error(f"[CarMax] Found {tile_data['total']} total listings")
+
+        # If no tiles found, check for "no results" indicators. The wait above
+        # already scanned for them unless it timed out.
+        if tile_data['total'] == 0:
+            # Run the scan in the page so only a boolean crosses CDP, not the whole body text
+            if page_state == 'empty' or (page_state is None and await page.evaluate(NO_RESULTS_JS, NO_RESULTS_RE.pattern)):
+                logging.error("[CarMax] No results found - returning empty")
+                return []
+
+        logging.error(f"[CarMax] Filtered out {tile_data['total'] - tile_data['kept']} recommendations, processing {tile_data['kept']} listings")
+
+        rows = tile_data['rows']
+        if extra_pages:
+            if tile_data['kept'] >= CARMAX_PAGE_SIZE:
+                for page_rows in await asyncio.gather(*extra_pages):
+                    rows.extend(page_rows)
+            else:
+                # The first page wasn't full, so there are no further pages
+                for task in extra_pages:
+                    task.cancel()
+
+        # Process filtered tiles - rows are plain strings, so parsing needs no awaits.
+        # Pages can overlap if inventory shifts between loads, so skip repeated URLs.
+        seen_urls = set()
+        for i, row in enumerate(rows):
+            if len(results) >= max_results:
+                break
+            try:
+                listing = parse_tile_row(row, search_arg)
+            except Exception as e:
+                logging.error(f"[CarMax] Error extracting listing {i}: {e}")
+                continue
+            if not listing or listing['url'] in seen_urls:
+                continue
+            seen_urls.add(listing['url'])
+            results.append(listing)
+            if on_listing:
+                on_listing(listing)
+        if results:
+            RESULTS_CACHE.store(cache_key, max_results, results)
+
+    except Exception as e:
+        logging.error(f"[CarMax] Scraping error: {e}")
+        import traceback
+        traceback.print_exc()
+
+    finally:
+        for task in extra_pages:
+            task.cancel()
+        if extra_pages:
+            await asyncio.gather(*extra_pages, return_exceptions=True)
+        if owns_browser:
+            await browser.close()
+        elif owns_page and page is not None:
+            await page.close()
+
+    # Limit results to max_results after filtering
+    logging.error(f"[CarMax] Returning {len(results)} results (limited to {max_results})")
+    return results[:max_results]
+
+
+def parse_query_input(query_input: str) -> tuple:
+    """
+    Parse a CLI query argument into (search_arg, search_filters).
+
+    Accepts a URL, structured JSON from parse_vehicle_query.py, a legacy
+    filter dict, or plain text.
+    """
+    if query_input.startswith('http') or not query_input.strip().startswith('{'):
+        # Direct URL or plain text query - only a '{' prefix can decode to a filter dict
+        return query_input, None
+
+    # Structured JSON format from parse_vehicle_query.py, decoded exactly once
+    try:
+        data = json_loads(query_input)
+    except ValueError:
+        return query_input, None
+
+    if 'structured' in data:
+        # Use adapter to convert structured to CarMax params
+        return data.get('query', 'Structured search'), adapt_structured_to_carmax(data['structured'])
+
+    # Direct filter dict (backward compatibility)
+    return 'Filter search', data
@@ -6,6 +6,7 @@ For example, "Sierra 3500HD" might be listed as "Sierra 3500" on some sites.
 
 This module provides mapping functions for scrapers to normalize model names.
 """
+from functools import lru_cache
 
 # Maps models to their canonical names for sites that don't distinguish
 # Key: Site name (or 'default' for sites that don't have HD variants)
@@ -41,6 +42,7 @@ SITE_MODEL_MAPPINGS = {
 }
 
 
+@lru_cache(maxsize=512)
 def normalize_model_for_site(model: str, site: str) -> str:
     """
     Normalize a model name for a specific site.
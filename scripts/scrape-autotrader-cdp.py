@@ -21,6 +21,19 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "playwright"])
     from playwright.sync_api import sync_playwright
 
+# Bot detection / site unavailable pages; one case-insensitive pass over the
+# body text instead of lowercasing it again for every phrase
+BOT_PAGE_RE = re.compile(
+    r"page unavailable|site unavailable|access denied|blocked|couldn't find the page"
+    r"|having trouble|please try again later|access to this page has been denied"
+    r"|you don't have permission|incident number:|we're sorry for any inconvenience",
+    re.IGNORECASE,
+)
+NO_RESULTS_RE = re.compile(
+    r'No matching vehicles|No results found|0 results|No cars found'
+    r'|Try changing your search|No exact matches'
+)
+
 
 def extract_number(text: str) -> int:
     if not text:
@@ -136,33 +149,12 @@ def scrape_autotrader_cdp(query: str, max_results: int = 10, cdp_url: str = "htt
                 pass
 
             # Check for bot detection / site unavailable errors
-            bot_detection_indicators = [
-                'page unavailable',
-                'site unavailable',
-                'access denied',
-                'blocked',
-                'couldn\'t find the page',
-                'having trouble',
-                'please try again later',
-                'Access to this page has been denied',
-                'you don\'t have permission',
-                'Incident Number:',
-                'We\'re sorry for any inconvenience'
-            ]
-            if any(indicator.lower() in page_text.lower() for indicator in bot_detection_indicators):
+            if BOT_PAGE_RE.search(page_text):
                 logging.error(f"[AutoTrader] BOT DETECTION / SITE UNAVAILABLE - returning empty")
                 return []
 
             # Check for "No results found" condition
-            no_results_indicators = [
-                'No matching vehicles',
-                'No results found',
-                '0 results',
-                'No cars found',
-                'Try changing your search',
-                'No exact matches'
-            ]
-            if any(indicator in page_text for indicator in no_results_indicators):
+            if NO_RESULTS_RE.search(page_text):
                 logging.error(f"[AutoTrader] No results found - returning empty")
                 return []
 
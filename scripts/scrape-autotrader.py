@@ -14,10 +14,11 @@ import os
 import sys
 import tempfile
 import logging
+import random
 import re
 import time
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Iterable, Optional, List
 
 logging.basicConfig(level=logging.ERROR, format='%(message)s', stream=sys.stderr)
 
@@ -183,6 +184,112 @@ def adapt_structured_to_autotrader(structured: dict) -> str:
     return url
 
 
+LISTING_LINK_SELECTOR = 'a[href*="/cars-for-sale/vehicle/"]'
+LISTING_COUNT_JS = f"document.querySelectorAll('{LISTING_LINK_SELECTOR}').length"
+PRICE_FALLBACK_RE = re.compile(r'(\d{1,2},\d{3})')
+# Mileage in link-row card text, e.g. "24,512 mi"
+LINK_MILEAGE_RE = re.compile(r'(\d[\d,]*)\s*mi\b', re.IGNORECASE)
+
+# Page-copy checks, each a single case-insensitive pass over the body text
+BOT_PAGE_RE = re.compile(r"page unavailable|incident number:|we're sorry", re.IGNORECASE)
+BLOCKED_PAGE_RE = re.compile(r'unavailable|incident number|blocked', re.IGNORECASE)
+NO_RESULTS_RE = re.compile(r'no results|no vehicles found|no exact matches|try your search again', re.IGNORECASE)
+
+CARD_SELECTOR = '[data-cmp="inventoryListing"]'
+CARD_MILEAGE_RE = re.compile(r'([\d,]+(?:\.\d+)?)\s*[kK]?\s*mi', re.IGNORECASE)
+
+# Maps every inventory card to a plain row in a single browser call. Cards
+# inside "Similar"/"Recommended"/"You might like" sections are flagged so the
+# caller keeps only the main search results.
+CARD_ROWS_JS = '''
+(cards, includeImages) => cards.map(card => {
+    let isRecommendation = false;
+    try {
+        let ancestor = card;
+        for (let i = 0; i < 10; i++) {
+            ancestor = ancestor.parentElement;
+            if (!ancestor) break;
+            const cmp = ancestor.getAttribute('data-cmp') || '';
+            const heading = ancestor.querySelector('h2, h3');
+            const headingText = heading ? heading.innerText.toLowerCase() : '';
+            if (cmp.includes('recommend') || cmp.includes('similar') ||
+                headingText.includes('similar') || headingText.includes('recommend') ||
+                headingText.includes('you might')) {
+                isRecommendation = true;
+                break;
+            }
+        }
+    } catch (e) {}
+
+    const title = card.querySelector('h2[data-cmp="subheading"]');
+    const price = card.querySelector('div[data-cmp="firstPrice"]');
+
+    let location = null;
+    for (const selector of ['[data-cmp="listingSummaryLocationText"]', '.dealer-name',
+                            '.location-text', '[data-cmp="dealerName"]']) {
+        const el = card.querySelector(selector);
+        if (el) {
+            location = el.innerText.trim();
+            break;
+        }
+    }
+
+    // The anchor wraps the title h2; fall back to any vehicle link in the card
+    const titleAnchor = title ? title.closest('a') : null;
+    const vehicleLink = card.querySelector('a[href*="/cars-for-sale/vehicle/"]');
+    const img = includeImages ? card.querySelector('img[data-cmp="inventoryImage"]') : null;
+
+    return {
+        isRecommendation: isRecommendation,
+        title: title ? title.innerText.trim() : null,
+        price: price ? price.innerText.trim() : '',
+        listItems: Array.from(card.querySelectorAll('ul[data-cmp="list"] li'), li => li.innerText.trim()),
+        location: location,
+        link: (titleAnchor && titleAnchor.href) || (vehicleLink && vehicleLink.getAttribute('href')) || '',
+        image: img ? (img.getAttribute('src') || '') : ''
+    };
+})
+'''
+
+# Maps every listing link to a plain row in a single CDP call instead of
+# holding one element handle per link and paying several round-trips each.
+# Card text is the innerText of the closest ancestor (up to 12 levels) with
+# more than 100 chars; image is the first autotrader.com <img> within 8 levels,
+# and the ancestor climb for it is skipped entirely when includeImages is false.
+LISTING_ROWS_JS = '''
+(anchors, includeImages) => anchors.map(a => {
+    let text = '';
+    let node = a;
+    for (let level = 0; level < 12 && node; level++) {
+        node = node.parentElement;
+        const nodeText = node ? node.innerText : '';
+        if (nodeText && nodeText.length > 100) {
+            text = nodeText;
+            break;
+        }
+    }
+
+    let image = '';
+    let ancestor = a;
+    for (let level = 0; includeImages && level < 8 && ancestor; level++) {
+        ancestor = ancestor.parentElement;
+        const img = ancestor ? ancestor.querySelector('img') : null;
+        if (img && img.src && img.src.includes('autotrader.com')) {
+            image = img.src;
+            break;
+        }
+    }
+
+    return {
+        href: a.getAttribute('href') || '',
+        title: (a.innerText || '').trim(),
+        text: text,
+        image: image
+    };
+})
+'''
+
+
 def extract_number(text: str) -> int:
     if not text:
         return 0
@@ -194,7 +301,157 @@ def extract_number(text: str) -> int:
         return 0
 
 
-def scrape_with_playwright_cdp(query: str, max_results: int, cdp_url: str = "http://localhost:9222"):
+def parse_listing_row(row: dict) -> Optional[dict]:
+    """
+    Turn one row from LISTING_ROWS_JS into a listing dict.
+
+    Returns None for non-vehicle links and listings without a price.
+    """
+    title = row['title']
+    if not title or len(title) < 10:
+        return None
+
+    # Price and mileage come from the closest ancestor with real card text
+    all_text = row['text']
+
+    price_match = re.search(r'\$\s*([\d,]+)', all_text)
+    price = extract_number(price_match.group(1)) if price_match else 0
+
+    if price == 0:
+        # Matches are always digits plus one comma, so skip extract_number
+        for match in PRICE_FALLBACK_RE.finditer(all_text):
+            potential_price = int(match.group(1).replace(',', ''))
+            if 5000 <= potential_price <= 500000:
+                price = potential_price
+                break
+
+    if price <= 0:
+        return None
+
+    mileage_match = LINK_MILEAGE_RE.search(all_text)
+    mileage = extract_number(mileage_match.group(1)) if mileage_match else 0
+
+    clean_url = row['href'].split('#')[0]
+    return {
+        'name': title,
+        'price': price,
+        'mileage': mileage,
+        'image': row['image'],
+        'retailer': 'AutoTrader',
+        'url': f"https://www.autotrader.com{clean_url}" if not clean_url.startswith('http') else clean_url,
+        'location': 'AutoTrader'
+    }
+
+
+def parse_card_row(row: dict) -> dict:
+    """Turn one row from CARD_ROWS_JS (tagged with its result index) into a listing dict."""
+    title = row['title'] or "Unknown"
+
+    # Price - div with data-cmp=firstPrice (just number, no $ sign)
+    price_digits = row['price'].replace(',', '')
+    price = int(price_digits) if price_digits.isdigit() else 0
+
+    # Mileage - first list item mentioning "mi", e.g. "65K mi" or "12,345 mi"
+    mileage = 0
+    for text in row['listItems']:
+        if 'mi' in text.lower():
+            num_match = CARD_MILEAGE_RE.search(text)
+            if num_match:
+                num_str = num_match.group(1).replace(',', '')
+                if 'k' in text.lower():
+                    mileage = int(float(num_str) * 1000)
+                else:
+                    mileage = int(float(num_str))
+            break
+
+    link = row['link']
+    if not link:
+        logging.error(f"[AutoTrader] Listing {row['idx']}: NO URL FOUND - this should not happen")
+        # Still add the listing - user wants all listings
+        link = f"https://www.autotrader.com/error-no-url-{row['idx']}"
+
+    return {
+        "name": title,           # Changed from "title" to "name" for backend compatibility
+        "price": price,
+        "mileage": mileage,
+        "location": row['location'] or "Unknown",
+        "url": link,             # Changed from "link" to "url" for backend compatibility
+        "image": row['image'].replace('&amp;', '&'),
+        "retailer": "AutoTrader",  # Explicit retailer name
+        "source": "autotrader"
+    }
+
+
+def extract_listings_from_page(page, max_results: int, include_images: bool = True,
+                               on_listing: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """
+    Extract listings from a loaded AutoTrader results page.
+
+    Shared by both scrape backends. Prefers the structured inventory cards
+    and falls back to bare vehicle links when the page renders none; either
+    way the DOM is read in a single browser call and parsed in Python.
+
+    Args:
+        page: Playwright page showing search results
+        max_results: Maximum number of listings to return
+        include_images: Set False to skip image URL lookups
+        on_listing: Optional callback invoked with each listing as soon as its
+            row is parsed (the page itself is read in one call beforehand)
+
+    Returns:
+        List of listing dicts
+    """
+    cards = page.eval_on_selector_all(CARD_SELECTOR, CARD_ROWS_JS, include_images)
+    logging.error(f"[AutoTrader] Found {len(cards)} total listing cards")
+
+    if cards:
+        # Get only main search result listings, not "Recommended" or "Similar" sections
+        main_cards = [card for card in cards if not card['isRecommendation']]
+        if len(main_cards) < len(cards):
+            logging.error(f"[AutoTrader] Filtered {len(cards) - len(main_cards)} recommendation cards, {len(main_cards)} main results")
+        rows = main_cards[:max_results]
+        for idx, row in enumerate(rows):
+            row['idx'] = idx
+        parse_row = parse_card_row
+    else:
+        link_rows = page.eval_on_selector_all(LISTING_LINK_SELECTOR, LISTING_ROWS_JS, include_images)
+        logging.error(f"[AutoTrader] Found {len(link_rows)} vehicle listing links")
+
+        # Deduplicate by vehicle ID; the same listing is linked from several spots
+        seen_vehicle_ids = set()
+        rows = []
+        for row in link_rows:
+            vehicle_id_match = re.search(r'/vehicle/(\d+)', row['href'].split('#')[0])
+            if vehicle_id_match and vehicle_id_match.group(1) not in seen_vehicle_ids:
+                seen_vehicle_ids.add(vehicle_id_match.group(1))
+                rows.append(row)
+        parse_row = parse_listing_row
+
+    # Rows are parsed lazily, so on_listing sees each listing as soon as its
+    # row is parsed and rows past max_results are never parsed at all
+    return collect_listings((parse_row(row) for row in rows), max_results, on_listing)
+
+
+def collect_listings(parsed: Iterable[Optional[dict]], max_results: int,
+                     on_listing: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """Gather up to max_results parsed listings, passing each to on_listing as it arrives."""
+    results = []
+    for vehicle in parsed:
+        if vehicle is None:
+            continue
+        results.append(vehicle)
+        if on_listing:
+            on_listing(vehicle)
+        logging.error(f"[AutoTrader] Extracted: {vehicle['name'][:50]} - ${vehicle['price']:,}")
+
+        if len(results) >= max_results:
+            break
+
+    return results
+
+
+def scrape_with_playwright_cdp(query: str, max_results: int, cdp_url: str = "http://localhost:9222",
+                               on_listing: Optional[Callable[[dict], None]] = None, include_images: bool = True):
     """Scrape using Playwright connected to Chrome CDP"""
     results = []
 
@@ -251,13 +508,12 @@ def scrape_with_playwright_cdp(query: str, max_results: int, cdp_url: str = "htt
             max_scroll_attempts = 15
 
             while scroll_attempts < max_scroll_attempts:
-                listings = page.query_selector_all('a[href*="/cars-for-sale/vehicle/"]')
-                current_count = len(listings)
+                # Count in the page rather than materializing a handle per link
+                current_count = page.evaluate(LISTING_COUNT_JS)
                 logging.error(f"[AutoTrader] Scroll attempt {scroll_attempts + 1}: Found {current_count} listings")
 
+                # Stop as soon as we have enough, before paying for another scroll + wait
                 if current_count >= max_results or current_count == last_listing_count:
-                    if current_count == last_listing_count and current_count > 0:
-                        break
                     break
 
                 last_listing_count = current_count
@@ -266,97 +522,15 @@ def scrape_with_playwright_cdp(query: str, max_results: int, cdp_url: str = "htt
                 time.sleep(1.5)
                 scroll_attempts += 1
 
-            page.evaluate('window.scrollTo(0, 0)')
-            time.sleep(2)
+            # No scroll back to top: extraction reads the DOM, which scrolling doesn't change
 
             # Check for bot detection
             page_text = page.inner_text('body')
-            if any(indicator in page_text.lower() for indicator in ['page unavailable', 'incident number:', 'we\'re sorry']):
+            if BOT_PAGE_RE.search(page_text):
                 logging.error(f"[AutoTrader] Bot detected - returning empty")
                 return []
 
-            # Deduplicate and extract listings
-            listings = page.query_selector_all('a[href*="/cars-for-sale/vehicle/"]')
-            logging.error(f"[AutoTrader] Found {len(listings)} vehicle listing links")
-
-            seen_vehicle_ids = set()
-            for listing in listings:
-                url = listing.get_attribute('href') or ''
-                clean_url = url.split('#')[0]
-                vehicle_id_match = re.search(r'/vehicle/(\d+)', clean_url)
-                if vehicle_id_match:
-                    vehicle_id = vehicle_id_match.group(1)
-                    if vehicle_id not in seen_vehicle_ids:
-                        seen_vehicle_ids.add(vehicle_id)
-                        # Extract listing data...
-                        link_text = listing.inner_text()
-                        title = link_text.strip()
-
-                        if not title or len(title) < 10:
-                            continue
-
-                        # Get price and mileage from ancestor text
-                        all_text = ''
-                        for ancestor_level in range(1, 13):
-                            try:
-                                ancestor = listing.evaluate(f'el => {{ let p = el; for(let i=0; i<{ancestor_level}; i++) p = p?.parentElement; return p?.innerText; }}')
-                                if ancestor and len(ancestor) > 100:
-                                    all_text = ancestor
-                                    break
-                            except:
-                                continue
-
-                        price_match = re.search(r'\$\s*([\d,]+)', all_text)
-                        price = extract_number(price_match.group(1)) if price_match else 0
-
-                        if price == 0:
-                            for match in re.finditer(r'(\d{1,2},\d{3})', all_text):
-                                potential_price = extract_number(match.group(1))
-                                if 5000 <= potential_price <= 500000:
-                                    price = potential_price
-                                    break
-
-                        mileage_match = re.search(r'(\d+)\s*mi\b', all_text, re.IGNORECASE)
-                        mileage = int(mileage_match.group(1)) if mileage_match else 0
-
-                        # Get image from ancestor elements
-                        image = ''
-                        try:
-                            img_src = listing.evaluate('''
-                                el => {
-                                    for (let level = 1; level <= 8; level++) {
-                                        let ancestor = el;
-                                        for (let i = 0; i < level; i++) {
-                                            if (ancestor) ancestor = ancestor.parentElement;
-                                        }
-                                        if (!ancestor) continue;
-                                        const img = ancestor.querySelector('img');
-                                        if (img && img.src && img.src.includes('autotrader.com')) {
-                                            return img.src;
-                                        }
-                                    }
-                                    return '';
-                                }
-                            ''')
-                            if img_src:
-                                image = img_src
-                        except:
-                            pass
-
-                        if price > 0:
-                            results.append({
-                                'name': title,
-                                'price': price,
-                                'mileage': mileage,
-                                'image': image,
-                                'retailer': 'AutoTrader',
-                                'url': f"https://www.autotrader.com{clean_url}" if not clean_url.startswith('http') else clean_url,
-                                'location': 'AutoTrader'
-                            })
-                            logging.error(f"[AutoTrader] {title[:30]} - ${price:,}")
-
-                        if len(results) >= max_results:
-                            break
+            results = extract_listings_from_page(page, max_results, include_images, on_listing)
 
         except Exception as e:
             logging.error(f"[AutoTrader] CDP scraping error: {e}")
@@ -364,7 +538,8 @@ def scrape_with_playwright_cdp(query: str, max_results: int, cdp_url: str = "htt
         return results
 
 
-def scrape_with_camoufox(query: str, max_results: int, os_choice: str = None):
+def scrape_with_camoufox(query: str, max_results: int, os_choice: str = None,
+                         on_listing: Optional[Callable[[dict], None]] = None, include_images: bool = True):
     """
     Scrape using Playwright Firefox (formerly Camoufox).
     Name kept for compatibility but now uses regular Firefox for better fingerprint.
@@ -413,7 +588,7 @@ def scrape_with_camoufox(query: str, max_results: int, os_choice: str = None):
 
         logging.error(f"[AutoTrader] Page text preview: {page_text[:200]}")
 
-        if any(keyword in page_text.lower() for keyword in ['unavailable', 'incident number', 'blocked']):
+        if BLOCKED_PAGE_RE.search(page_text):
             logging.error(f"[AutoTrader] BOT DETECTED - retry needed")
             browser.close()
             return None
@@ -421,162 +596,24 @@ def scrape_with_camoufox(query: str, max_results: int, os_choice: str = None):
         logging.error(f"[AutoTrader] Page loaded successfully, extracting...")
 
         # Check for "no results" page first
-        no_results_indicators = ['no results', 'no vehicles found', 'no exact matches', 'try your search again']
-        page_text_lower = page_text.lower()
-        if any(indicator in page_text_lower for indicator in no_results_indicators):
+        if NO_RESULTS_RE.search(page_text):
             logging.error(f"[AutoTrader] No results page detected - returning empty list")
             browser.close()
             return []  # Empty results, NOT an error
 
         try:
-            page.wait_for_selector('[data-cmp="inventoryListing"]', timeout=10000)
+            page.wait_for_selector(CARD_SELECTOR, timeout=10000)
         except:
             logging.error(f"[AutoTrader] No listings found or timeout - may be no results or page structure changed")
 
-        # Get only main search result listings, not "Recommended" or "Similar" sections
-        # AutoTrader wraps recommendations in sections with headers like "Similar Vehicles"
-        listing_cards = page.query_selector_all('[data-cmp="inventoryListing"]')
-        logging.error(f"[AutoTrader] Found {len(listing_cards)} total listing cards")
-
-        # Filter out cards in recommendation/similar sections
-        main_cards = []
-        for card in listing_cards:
-            try:
-                is_recommendation = card.evaluate('''(el) => {
-                    let ancestor = el;
-                    for (let i = 0; i < 10; i++) {
-                        ancestor = ancestor.parentElement;
-                        if (!ancestor) break;
-                        const text = ancestor.getAttribute('data-cmp') || '';
-                        const heading = ancestor.querySelector('h2, h3');
-                        const headingText = heading ? heading.innerText.toLowerCase() : '';
-                        if (text.includes('recommend') || text.includes('similar') ||
-                            headingText.includes('similar') || headingText.includes('recommend') ||
-                            headingText.includes('you might')) {
-                            return true;
-                        }
-                    }
-                    return false;
-                }''')
-                if not is_recommendation:
-                    main_cards.append(card)
-            except:
-                main_cards.append(card)  # Include on error
-
-        if len(main_cards) < len(listing_cards):
-            logging.error(f"[AutoTrader] Filtered {len(listing_cards) - len(main_cards)} recommendation cards, {len(main_cards)} main results")
-
-        for idx, card in enumerate(main_cards):
-            if idx >= max_results:
-                break
-            try:
-                # Title - h2 with data-cmp=subheading
-                title_elem = card.query_selector('h2[data-cmp="subheading"]')
-                title = title_elem.inner_text().strip() if title_elem else "Unknown"
-
-                # Price - div with data-cmp=firstPrice (just number, no $ sign)
-                price_elem = card.query_selector('div[data-cmp="firstPrice"]')
-                price_text = price_elem.inner_text().strip() if price_elem else ""
-                price = int(price_text.replace(',', '')) if price_text and price_text.replace(',', '').isdigit() else 0
-
-                # Mileage - in the list items, look for text containing "mi"
-                mileage = 0
-                list_items = card.query_selector_all('ul[data-cmp="list"] li')
-                for item in list_items:
-                    text = item.inner_text().strip()
-                    if 'mi' in text.lower():
-                        # Extract number from "65K mi" or "12,345 mi"
-                        num_match = re.search(r'([\d,]+(?:\.\d+)?)\s*[kK]?\s*mi', text, re.IGNORECASE)
-                        if num_match:
-                            num_str = num_match.group(1).replace(',', '')
-                            # Handle K suffix
-                            if 'k' in text.lower():
-                                mileage = int(float(num_str) * 1000)
-                            else:
-                                mileage = int(float(num_str))
-                        break
-
-                # Location - try various selectors
-                location = "Unknown"
-                location_selectors = [
-                    '[data-cmp="listingSummaryLocationText"]',
-                    '.dealer-name',
-                    '.location-text',
-                    '[data-cmp="dealerName"]'
-                ]
-                for selector in location_selectors:
-                    location_elem = card.query_selector(selector)
-                    if location_elem:
-                        location = location_elem.inner_text().strip()
-                        break
-
-                # Image - img with data-cmp="inventoryImage"
-                image = ""
-                img_elem = card.query_selector('img[data-cmp="inventoryImage"]')
-                if img_elem:
-                    image = img_elem.get_attribute('src') or ""
-                    # Clean up HTML entities in URL
-                    image = image.replace('&amp;', '&')
-
-                # Link - AutoTrader listings always have a link
-                # HTML structure: <a href="..."><h2 data-cmp="subheading">TITLE</h2></a>
-                # The anchor wraps the h2, so we need to find h2 first, then get parent anchor
-                link = ""
-                try:
-                    # Find the h2 element with data-cmp="subheading"
-                    h2_elem = card.query_selector('h2[data-cmp="subheading"]')
-
-                    if h2_elem:
-                        # Get the parent anchor tag of the h2 element
-                        # The anchor wraps the h2, so we use evaluate to call closest() on the h2
-                        link_result = h2_elem.evaluate('(el) => { const anchor = el.closest("a"); return anchor ? anchor.href : null; }')
-                        if link_result:
-                            link = link_result
-                            logging.error(f"[AutoTrader] Listing {idx}: Found URL via h2 parent anchor: {link[:80]}...")
-                        else:
-                            logging.error(f"[AutoTrader] Listing {idx}: h2 found but no parent anchor")
-                    else:
-                        logging.error(f"[AutoTrader] Listing {idx}: No h2[data-cmp='subheading'] found in card")
-
-                    # Fallback: try finding anchor with vehicle href directly
-                    if not link:
-                        fallback_links = card.query_selector_all('a[href*="/cars-for-sale/vehicle/"]')
-                        if fallback_links:
-                            link = fallback_links[0].get_attribute('href') or ""
-                            logging.error(f"[AutoTrader] Listing {idx}: Found URL via fallback (vehicle href)")
-
-                except Exception as e:
-                    logging.error(f"[AutoTrader] Error extracting link for listing {idx}: {e}")
-
-                # If still no link, log details for debugging
-                if not link:
-                    logging.error(f"[AutoTrader] Listing {idx}: NO URL FOUND - this should not happen")
-                    # Still add the listing - user wants all listings
-                    link = f"https://www.autotrader.com/error-no-url-{idx}"
-
-                vehicle = {
-                    "name": title,           # Changed from "title" to "name" for backend compatibility
-                    "price": price,
-                    "mileage": mileage,
-                    "location": location,
-                    "url": link,             # Changed from "link" to "url" for backend compatibility
-                    "image": image,          # Extracted from img[data-cmp="inventoryImage"]
-                    "retailer": "AutoTrader",  # Explicit retailer name
-                    "source": "autotrader"
-                }
-
-                results.append(vehicle)
-                logging.error(f"[AutoTrader] Extracted: {title} - ${price:,}")
-
-            except Exception as e:
-                logging.error(f"[AutoTrader] Error extracting vehicle {idx}: {e}")
-                continue
+        results = extract_listings_from_page(page, max_results, include_images, on_listing)
 
         browser.close()
 
     return results
 
-def scrape_autotrader(query: str, max_results: int = 10, cdp_url: str = "http://localhost:9222", enable_vpn: bool = False):
+def scrape_autotrader(query: str, max_results: int = 10, cdp_url: str = "http://localhost:9222", enable_vpn: bool = False,
+                      on_listing: Optional[Callable[[dict], None]] = None, include_images: bool = True):
     """
     Main scrape function.
 
@@ -589,6 +626,8 @@ def scrape_autotrader(query: str, max_results: int = 10, cdp_url: str = "http://
         max_results: Maximum number of results to return
         cdp_url: CDP URL (not used, kept for compatibility)
         enable_vpn: Ignored (worker handles VPN)
+        on_listing: Optional callback invoked with each listing as soon as it is extracted
+        include_images: Set False to skip image URL lookups (image fields come back empty)
 
     Returns:
         List of vehicle listings, or None if bot detected
@@ -596,17 +635,34 @@ def scrape_autotrader(query: str, max_results: int = 10, cdp_url: str = "http://
     # If Camoufox is not available, fall back to CDP
     if not CAMOUFOX_AVAILABLE:
         logging.error(f"[AutoTrader] Camoufox not available, falling back to CDP...")
-        return scrape_with_playwright_cdp(query, max_results, cdp_url)
+        return scrape_with_playwright_cdp(query, max_results, cdp_url, on_listing=on_listing,
+                                          include_images=include_images)
 
     # Try scraping with Camoufox
     # Bot detection returns None for worker to retry with VPN
-    return scrape_with_camoufox(query, max_results, os_choice='windows')
+    return scrape_with_camoufox(query, max_results, os_choice='windows', on_listing=on_listing,
+                                include_images=include_images)
+
+
+def emit_jsonl(listing: dict) -> None:
+    """Write one listing to stdout as a JSON Lines record."""
+    print(json.dumps(listing))
+    sys.stdout.flush()
 
 
 def main():
+    # JSON Lines mode writes each listing as soon as it is parsed instead of
+    # one array at the end. The page is still read in a single call first, so
+    # output starts after that read, not per card loaded; callers wanting an
+    # array can use `jq -s .`
+    jsonl = '--jsonl' in sys.argv or os.environ.get('NEON_JSONL') == '1'
+    # Pure price/URL pipelines can skip the per-listing image lookup
+    include_images = '--no-images' not in sys.argv and os.environ.get('NEON_NO_IMAGES') != '1'
+    sys.argv = [arg for arg in sys.argv if arg not in ('--jsonl', '--no-images')]
+
     if len(sys.argv) < 2:
         print(json.dumps({
-            "error": "Usage: scrape-autotrader.py <URL or search query or structured> [max_results]",
+            "error": "Usage: scrape-autotrader.py <URL or search query or structured> [max_results] [--jsonl] [--no-images]",
             "examples": [
                 "scrape-autotrader.py 'GMC Sierra Denali black'",
                 "scrape-autotrader.py 'https://www.autotrader.com/cars-for-sale/...'",
@@ -638,7 +694,8 @@ def main():
         query = query_input
 
     try:
-        result = scrape_autotrader(query, max_results)
+        result = scrape_autotrader(query, max_results, on_listing=emit_jsonl if jsonl else None,
+                                   include_images=include_images)
 
         # Handle different return types
         # - None: bot detection (worker will retry with VPN)
@@ -649,6 +706,9 @@ def main():
             print(json.dumps({"error": "Bot detection - retry with VPN"}))
             sys.stdout.flush()
             sys.exit(1)
+        elif jsonl:
+            # Listings were already written as they were parsed
+            pass
         elif not result or (isinstance(result, list) and len(result) == 0):
             # No results - return empty list (NOT an error)
             print("[]")
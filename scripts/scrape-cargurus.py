@@ -20,14 +20,18 @@ IMPORTANT: Trim is JUST the trim name (no drivetrain suffix!)
 - Drivetrain is a separate filter: drivetrain="FOUR_WHEEL_DRIVE"
 """
 import asyncio
+import copy
 import json
 import os
 import sys
 import tempfile
+import time
 import logging
 import re
 from pathlib import Path
+from hashlib import blake2b
 from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlencode
 
 # Suppress logs to stderr
 logging.basicConfig(
@@ -44,6 +48,8 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+from scraper_common import ResultsCache, extract_number, json_dumps, json_loads, serve_jsonl
+
 
 # Filter parameter mapping for URL construction
 FILTER_PARAM_MAPPING = {
@@ -59,6 +65,116 @@ FILTER_PARAM_MAPPING = {
     'mileageMax': 'mileageMax'
 }
 
+# Entity codes found by homepage discovery, persisted across runs:
+# {make_lower: {"code": make_code, "models": {model_lower: model_code}}}
+ENTITY_CACHE_PATH = Path(tempfile.gettempdir()) / 'cargurus_codes.json'
+# Known codes (see module docstring) used before anything is discovered
+ENTITY_CODE_SEED = {
+    'gmc': {'code': 'm26', 'models': {'yukon': 'd130', 'sierra 1500': 'd116', 'sierra 3500hd': 'd973'}},
+}
+# Loaded lazily by load_entity_codes
+_entity_codes = None
+
+# Recent scrape results, one JSON file per normalized filter set. Opt-in:
+# set CARGURUS_CACHE_TTL to a number of seconds (e.g. 900) to answer repeat
+# searches from it; "no results" answers expire after at most 300 seconds.
+# By default every run scrapes live.
+RESULTS_CACHE_TTL = int(os.environ.get('CARGURUS_CACHE_TTL', '0'))
+RESULTS_CACHE = ResultsCache(
+    Path(tempfile.gettempdir()) / 'neon-cargurus-cache',
+    RESULTS_CACHE_TTL,
+    empty_ttl=min(RESULTS_CACHE_TTL, 300),
+    label='[CarGurus] ',
+)
+
+# Patterns applied to every listing
+PRICE_RE = re.compile(r'\$[\d,]+')
+MILEAGE_RE = re.compile(r'([\d,]+)\s*(?:mi|miles)', re.IGNORECASE)
+LOCATION_RE = re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2})')
+TRIM_RE = re.compile(r'(Denali|SLE|SLT|AT4|Elevation)\s*\w*')
+# A card is only worth reading if it shows a price or a mileage
+LISTING_KEEP_PATTERN = f'{PRICE_RE.pattern}|{MILEAGE_RE.pattern}'
+
+# Page copy for a bot-detection block (any case) and for an empty search
+RESTRICTED_RE = re.compile(
+    r'access is temporarily restricted|access restricted|suspicious activity'
+    r'|bot detection|please verify you are human|we need to make sure you are not a robot',
+    re.IGNORECASE,
+)
+NO_RESULTS_RE = re.compile(r'No matching vehicles|No results found|0 results|No cars found|Try changing your search')
+# Classifies the page in the browser so only a verdict crosses CDP, not the body text
+PAGE_STATE_JS = """([restricted, noResults]) => {
+    const text = document.body ? document.body.innerText : '';
+    if (new RegExp(restricted, 'i').test(text)) return 'restricted';
+    if (new RegExp(noResults).test(text)) return 'empty';
+    return null;
+}"""
+
+# Listing cards on a results page, most specific first
+LISTING_SELECTORS = [
+    'a[href*="/details/"]',  # CarGurus links to car details
+    '[data-testid="listing-card"]',
+    'article',
+    '[class*="listing"]',
+]
+# First of `selectors` with any match in the page, as [selector, count], or null
+FIRST_SELECTOR_JS = """(selectors) => {
+    for (const selector of selectors) {
+        const count = document.querySelectorAll(selector).length;
+        if (count) return [selector, count];
+    }
+    return null;
+}"""
+# Debug screenshots cost a full-page PNG encode, so they are opt-in
+DEBUG_SCREENSHOTS = bool(os.environ.get('SCRAPER_DEBUG_SCREENSHOTS'))
+# Either homepage control appearing means discovery can start
+HOMEPAGE_READY_SELECTOR = '[aria-label="Select Make"], input[name="searchQuery"]'
+# Either of these appearing means the results have rendered
+LISTING_READY_SELECTOR = 'a[href*="/details/"], [data-testid="listing-card"]'
+# Image URL of an <img>. Images are blocked at launch, so fall back to the
+# lazy-load attributes CarGurus fills in before the request would fire.
+IMAGE_URL_JS = """el => el.getAttribute('src') || el.getAttribute('data-src')
+    || (el.getAttribute('srcset') || el.getAttribute('data-srcset') || '').trim().split(/\\s+/)[0]"""
+# Reads the fields of the first maxResults listings whose text matches
+# keepPattern, in one browser call, for eval_on_selector_all
+LISTING_ROWS_JS = """(els, [maxResults, keepPattern]) => {
+    const imageUrl = """ + IMAGE_URL_JS + """;
+    const keep = new RegExp(keepPattern, 'i');
+    const rows = [];
+    for (const el of els) {
+        if (rows.length >= maxResults) break;
+        const text = el.innerText;
+        // Cards parse_listing_row would drop (ads, promos) don't use up a slot
+        if (!keep.test(text)) continue;
+        const heading = el.querySelector('h4, h3, h2');
+        // Try img tag first, then fallback to image tag, then SVG-embedded image
+        const img = el.querySelector('img');
+        const imageElem = img ? null : el.querySelector('image');
+        const svgImage = img || imageElem ? null : el.querySelector('svg image');
+        const link = el.tagName === 'A' ? el : el.querySelector('a[href*="/details/"]');
+        rows.push({
+            text: text,
+            heading: heading ? heading.innerText : null,
+            image: img ? imageUrl(img) : imageElem ? imageElem.getAttribute('src')
+                : svgImage ? svgImage.getAttribute('xlink:href') : '',
+            href: link ? link.getAttribute('href') : '',
+        });
+    }
+    return rows;
+}"""
+# True once the model dropdown has options beyond its placeholder
+MODELS_LOADED_JS = """() => {
+    const dropdown = document.querySelector('[aria-label="Select Model"], select[name="model"], #model');
+    return !!dropdown && Array.from(dropdown.options).some(opt => opt.value !== "");
+}"""
+# Resolves when running CSS/Web animations finish, or after `timeout` ms
+ANIMATIONS_DONE_JS = """(timeout) => Promise.race([
+    Promise.all(document.getAnimations().map(a => a.finished.catch(() => null))),
+    new Promise(resolve => setTimeout(resolve, timeout)),
+])"""
+# True once the page has navigated away from `url`
+URL_CHANGED_JS = "url => location.href !== url"
+
 
 def adapt_structured_to_cargurus(structured: dict) -> dict:
     """
@@ -180,16 +296,190 @@ def adapt_structured_to_cargurus(structured: dict) -> dict:
     return params
 
 
-def extract_number(text: str) -> int:
-    """Extract number from text like '$20,000' or '20,000 mi'"""
-    if not text:
-        return 0
-    cleaned = re.sub(r'[^\d,.]', '', text)
-    cleaned = cleaned.replace(',', '')
+async def debug_screenshot(page, name: str) -> None:
+    """Save /tmp/cargurus-<name>.png when SCRAPER_DEBUG_SCREENSHOTS is set."""
+    if not DEBUG_SCREENSHOTS:
+        return
+    path = f'/tmp/cargurus-{name}.png'
+    try:
+        await page.screenshot(path=path)
+        logging.error(f"Screenshot saved to {path}")
+    except Exception:
+        pass
+
+
+async def wait_for_animation_end(page, timeout: int = 2000) -> None:
+    """Wait (at most timeout ms) for in-flight page animations to settle."""
     try:
-        return int(float(cleaned))
-    except (ValueError, AttributeError):
-        return 0
+        await page.evaluate(ANIMATIONS_DONE_JS, timeout)
+    except Exception as e:
+        logging.error(f"Animation wait failed: {e}")
+
+
+async def wait_for_results(page, timeout: int = 15000) -> bool:
+    """Wait for the first listing to render; False if none shows up in time."""
+    try:
+        await page.wait_for_selector(LISTING_READY_SELECTOR, timeout=timeout)
+    except Exception:
+        logging.error("No listing appeared before timeout")
+        return False
+    await wait_for_animation_end(page)
+    return True
+
+
+async def check_page_state(page) -> Optional[str]:
+    """'restricted' for a bot-detection page, 'empty' for no results, else None."""
+    return await page.evaluate(PAGE_STATE_JS, [RESTRICTED_RE.pattern, NO_RESULTS_RE.pattern])
+
+
+async def find_listing_selector(page, attempts: int = 2, backoff: float = 1.5) -> Optional[str]:
+    """Return the first listing selector that matches, retrying once if none match."""
+    for attempt in range(attempts):
+        # All selectors are probed in one browser call, keeping their priority
+        match = await page.evaluate(FIRST_SELECTOR_JS, LISTING_SELECTORS)
+        if match:
+            selector, count = match
+            logging.error(f"Found {count} potential listings with selector: {selector}")
+            return selector
+        if attempt + 1 < attempts:
+            await asyncio.sleep(backoff)
+    return None
+
+
+async def wait_for_first(page, selectors: List[str], timeout: int = 15000) -> Optional[str]:
+    """
+    Wait up to timeout ms for any of selectors, then return the first of
+    them (in list order) that matches, or None if none appeared.
+    """
+    try:
+        await page.wait_for_selector(', '.join(selectors), timeout=timeout)
+    except Exception:
+        return None
+    match = await page.evaluate(FIRST_SELECTOR_JS, selectors)
+    return match[0] if match else None
+
+
+async def read_listing_rows(page, selector: Optional[str], max_results: int) -> List[Dict]:
+    """Plain-data rows for the first max_results listings matching selector."""
+    if not selector:
+        return []
+    return await page.eval_on_selector_all(selector, LISTING_ROWS_JS, [max_results, LISTING_KEEP_PATTERN])
+
+
+def parse_listing_row(row: Dict, default_name: str, detect_trim: bool = True) -> Optional[Dict]:
+    """Turn one LISTING_ROWS_JS row into a listing; None if it has neither price nor mileage."""
+    all_text = row['text']
+
+    # Extract name from heading or use search criteria
+    name = row['heading'] or default_name
+
+    # Extract price
+    price = 0
+    price_match = PRICE_RE.search(all_text)
+    if price_match:
+        price = extract_number(price_match.group())
+
+    # Extract mileage
+    mileage = 0
+    mileage_match = MILEAGE_RE.search(all_text)
+    if mileage_match:
+        mileage = extract_number(mileage_match.group(1))
+
+    # Extract URL
+    url = row['href'] or ''
+    if url and not url.startswith('http'):
+        url = f"https://www.cargurus.com{url}"
+
+    # Extract location
+    location = 'Unknown'
+    location_match = LOCATION_RE.search(all_text)
+    if location_match:
+        location = f"{location_match.group(1)}, {location_match.group(2)}"
+
+    # Extract trim from text if available
+    trim_found = ''
+    if detect_trim:
+        trim_match = TRIM_RE.search(all_text)
+        if trim_match:
+            trim_found = trim_match.group(1)
+
+    if price <= 0 and mileage <= 0:
+        return None
+
+    logging.error(f"Extracted: {name[:40]} - ${price} - {mileage} mi")
+    return {
+        'name': name.strip(),
+        'price': price,
+        'mileage': mileage,
+        'trim': trim_found,
+        'image': row['image'] or '',
+        'retailer': 'CarGurus',
+        'url': url,
+        'location': location
+    }
+
+
+def load_entity_codes() -> dict:
+    """Entity code cache: the seed merged with whatever is on disk."""
+    global _entity_codes
+    if _entity_codes is None:
+        _entity_codes = copy.deepcopy(ENTITY_CODE_SEED)
+        try:
+            with open(ENTITY_CACHE_PATH) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        for make_key, entry in cached.items():
+            merged = _entity_codes.setdefault(make_key, {'code': entry['code'], 'models': {}})
+            merged['code'] = entry['code']
+            merged['models'].update(entry.get('models', {}))
+    return _entity_codes
+
+
+def lookup_entity_codes(make: str, model: str) -> Tuple[Optional[str], Optional[str]]:
+    """Cached (make_code, model_code), or (None, None) if either is unknown."""
+    entry = load_entity_codes().get(make.lower())
+    if not entry:
+        return None, None
+    model_code = entry['models'].get(model.lower())
+    if not model_code:
+        return None, None
+    return entry['code'], model_code
+
+
+def store_entity_codes(make: str, model: str, make_code: str, model_code: str) -> None:
+    """Remember discovered codes in memory and on disk; disk failures are logged."""
+    codes = load_entity_codes()
+    entry = codes.setdefault(make.lower(), {'code': make_code, 'models': {}})
+    entry['code'] = make_code
+    entry['models'][model.lower()] = model_code
+    try:
+        # Write then rename so concurrent scrapers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=ENTITY_CACHE_PATH.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(codes, f)
+        os.replace(tmp_path, ENTITY_CACHE_PATH)
+    except OSError as e:
+        logging.error(f"Could not write entity code cache: {e}")
+
+
+def filters_cache_key(search_filters: dict) -> str:
+    """
+    Cache key for scrape_cars() filters.
+
+    Filters that differ only in key order, make/model case, stray whitespace
+    or spelling out the default zip/distance map to the same key.
+    """
+    normalized = {'zip': '94002', 'distance': 200}
+    for key, value in search_filters.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if key in ('make', 'model'):
+                value = value.lower()
+        normalized[key] = value
+    normalized['zip'] = str(normalized['zip'])
+    normalized['distance'] = int(normalized['distance'])
+    return blake2b(json_dumps(normalized, sort_keys=True, default=str)).hexdigest()
 
 
 async def discover_make_and_model_codes(page, make: str, model: str) -> Tuple[Optional[str], Optional[str]]:
@@ -212,24 +502,13 @@ async def discover_make_and_model_codes(page, make: str, model: str) -> Tuple[Op
             'select[data-test="make-select"]',
         ]
 
-        make_dropdown = None
-        for selector in make_selectors:
-            try:
-                make_dropdown = await page.wait_for_selector(selector, timeout=15000)  # Increased from 5000
-                if make_dropdown:
-                    logging.error(f"Found make dropdown with selector: {selector}")
-                    break
-            except:
-                continue
-
-        if not make_dropdown:
+        # One wait covers every candidate instead of up to 15s per selector
+        make_selector = await wait_for_first(page, make_selectors)
+        if make_selector:
+            logging.error(f"Found make dropdown with selector: {make_selector}")
+        else:
             logging.error(f"Could not find make dropdown with any selector")
-            # Take screenshot for debugging
-            try:
-                await page.screenshot(path='/tmp/cargurus-no-dropdown.png')
-                logging.error("Screenshot saved to /tmp/cargurus-no-dropdown.png")
-            except:
-                pass
+            await debug_screenshot(page, 'no-dropdown')
             return None, None
 
         # Get all make options
@@ -268,9 +547,9 @@ async def discover_make_and_model_codes(page, make: str, model: str) -> Tuple[Op
             logging.error(f"Make '{make}' not found. Available: {[m['name'] for m in makes[:10]]}")
             return None, None
 
-        # Select the make using the same selector strategy
+        # Select the make, starting with the dropdown that was found
         selected = False
-        for selector in make_selectors:
+        for selector in sorted(make_selectors, key=lambda sel: sel != make_selector):
             try:
                 await page.select_option(selector, make_code, timeout=5000)
                 selected = True
@@ -283,7 +562,11 @@ async def discover_make_and_model_codes(page, make: str, model: str) -> Tuple[Op
             logging.error(f"Could not select make")
             return None, None
 
-        await asyncio.sleep(2)  # Wait for models to populate
+        # Wait for models to populate
+        try:
+            await page.wait_for_function(MODELS_LOADED_JS, timeout=5000)
+        except Exception:
+            logging.error("Model dropdown did not populate before timeout")
 
         # Get all model options for this make
         models = await page.evaluate('''() => {
@@ -321,14 +604,8 @@ async def discover_make_and_model_codes(page, make: str, model: str) -> Tuple[Op
             return None, None
 
     except Exception as e:
-        logging.error(f"Error discovering make/model codes: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            await page.screenshot(path='/tmp/cargurus-error.png')
-            logging.error("Screenshot saved to /tmp/cargurus-error.png")
-        except:
-            pass
+        logging.exception(f"Error discovering make/model codes: {e}")
+        await debug_screenshot(page, 'error')
         return None, None
 
     return make_code, model_code
@@ -377,17 +654,15 @@ def build_search_url(
     # Correct format: makeModelTrimPaths={make},{make}/{model},{make}/{model}/{trim}
     # Note: trim comes LAST as a third path option, NOT in the middle
     if trim:
-        # URL encode the trim name (spaces become + or %20)
-        # Preserve original case (Denali Ultimate -> Denali+Ultimate)
-        trim_encoded = trim.replace(' ', '+')
-        makeModelTrimPaths = f"{make_code},{make_code}/{model_code},{make_code}/{model_code}/{trim_encoded}"
+        # Preserve original case; urlencode turns spaces into + (Denali Ultimate -> Denali+Ultimate)
+        makeModelTrimPaths = f"{make_code},{make_code}/{model_code},{make_code}/{model_code}/{trim}"
     else:
         makeModelTrimPaths = f"{make_code},{make_code}/{model_code}"
 
     # Build URL parameters
     params = {
         'zip': zip_code,
-        'distance': str(distance),
+        'distance': distance,
         'makeModelTrimPaths': makeModelTrimPaths,
         'sourceContext': 'carGurusHomePageModel'
     }
@@ -405,44 +680,157 @@ def build_search_url(
                 value = value.upper()
             params[url_param] = value
 
-    # Build query string
-    query_parts = []
-    for k, v in params.items():
-        # URL encode the value (especially for colors like "BLACK" and trim with spaces)
-        import urllib.parse
-        if v:
-            # Use quote with safe='+' to preserve + signs in trim names
-            # quote() encodes spaces as %20, so we manually convert to +
-            encoded = urllib.parse.quote(str(v), safe='+')
-            # Then convert %20 back to + for CarGurus compatibility
-            encoded = encoded.replace('%20', '+')
-            query_parts.append(f"{k}={encoded}")
-    return f"{base_url}?{'&'.join(query_parts)}"
-
-
-async def scrape_cars(search_filters: dict, max_results: int = 10):
-    """Scrape car listings from CarGurus using Camoufox
+    # Build query string - spaces become + and existing + signs in trim
+    # names are kept, which is what CarGurus expects
+    return f"{base_url}?{urlencode({k: v for k, v in params.items() if v}, safe='+')}"
+
+
+# Max scrapes sharing the browser at once in --serve mode
+SERVE_CONCURRENCY = 2
+# Camoufox's humanized cursor adds latency to every action. The cached-code
+# path never touches a control, so it's off unless CARGURUS_HUMANIZE is set.
+HUMANIZE = bool(os.environ.get('CARGURUS_HUMANIZE', ''))
+# Camoufox can freeze when pages are opened concurrently, so page creation
+# is serialized and spaced at least PAGE_CREATE_DELAY seconds apart
+PAGE_CREATE_LOCK = asyncio.Lock()
+PAGE_CREATE_DELAY = 2.0
+_last_page_created = 0.0
+# Window and page size. Still wide enough for the desktop results layout,
+# but about half the pixels of the 1920x1080 screen to lay out and paint.
+VIEWPORT = {'width': 1280, 'height': 800}
+
+
+async def launch_browser():
+    """Start Camoufox configured for CarGurus."""
+    # Launch Camoufox in headed mode with full xvfb resolution
+    logging.error("Display: {}".format(os.environ.get('DISPLAY', 'not set')))
+    return await AsyncCamoufox(
+        screen=Screen(max_width=1920, max_height=1080),  # Match xvfb resolution
+        # Open the window at page size instead of resizing from the OS default
+        window=(VIEWPORT['width'], VIEWPORT['height']),
+        headless=False,  # Use headed mode with xvfb
+        humanize=HUMANIZE,
+        # Only image URLs are scraped, never the pixels
+        block_images=True,
+        block_webrtc=True,
+    ).__aenter__()
+
+
+async def new_page(browser):
+    """Open a VIEWPORT-sized page, one creation at a time across concurrent scrapes."""
+    global _last_page_created
+    async with PAGE_CREATE_LOCK:
+        # Only waits when another page was opened moments ago
+        wait = _last_page_created + PAGE_CREATE_DELAY - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await browser.new_page(viewport=VIEWPORT)
+        finally:
+            _last_page_created = time.monotonic()
 
-    Args:
-        search_filters: Dict with make, model, zip, trim, etc.
-        max_results: Maximum number of results to return
 
-    Supported filters:
-        - make: Make name (e.g., 'GMC')
-        - model: Model name (e.g., 'Yukon')
-        - zip: ZIP code (default: '94002')
-        - distance: Search radius in miles (default: 200)
-        - trim: Trim name ONLY, no drivetrain suffix (e.g., 'Denali Ultimate', 'SLE', 'SLT', 'AT4')
-        - yearMin/yearMax: Year range
-        - minPrice/maxPrice: Price range
-        - exteriorColor/interiorColor: Color codes (BLACK, WHITE, GRAY, etc.)
-        - drivetrain: FOUR_WHEEL_DRIVE, ALL_WHEEL_DRIVE, FOUR_BY_TWO (separate from trim!)
-        - fuelType: GASOLINE, DIESEL, FLEX_FUEL_VEHICLE, etc.
-        - transmission: AUTOMATIC, MANUAL
-        - mileageMax: Maximum mileage
+async def search_via_search_box(page, query: str, max_results: int) -> Optional[List[Dict]]:
     """
+    Search CarGurus for a free-text query through the homepage search box.
+
+    The page must already be on the homepage. Returns None on bot detection,
+    [] when the site reports no results, and otherwise the parsed listings
+    (or a single error dict).
+    """
+    results = []
+
+    try:
+        # Look for search input box on the homepage
+        search_selectors = [
+            'input[name="searchQuery"]',
+            'input[placeholder*="search" i]',
+            'input[type="search"]',
+            '#search-input',
+            '[data-test="search-input"]',
+        ]
+
+        # One wait covers every candidate instead of up to 15s per selector
+        search_selector = await wait_for_first(page, search_selectors)
+        search_input = await page.query_selector(search_selector) if search_selector else None
+        if search_input:
+            logging.error(f"Found search input with selector: {search_selector}")
+        else:
+            logging.error("Could not find search input on homepage - likely bot detection")
+            await debug_screenshot(page, 'no-search')
+            return None  # Signal bot detection to worker for VPN retry
+
+        # Enter search query
+        await search_input.fill(query)
+        logging.error(f"Entered search query: {query}")
+        await asyncio.sleep(1)
+
+        # Submit search (press Enter)
+        start_url = page.url
+        await search_input.press('Enter')
+        logging.error("Submitted search")
+        # The homepage can already contain listing cards, so wait for the
+        # search to navigate before waiting for results
+        try:
+            await page.wait_for_function(URL_CHANGED_JS, arg=start_url, timeout=8000)
+        except Exception:
+            logging.error("Search did not navigate before timeout")
+        await wait_for_results(page)
+
+        await debug_screenshot(page, 'search-results')
+
+        # Scroll to bottom to trigger lazy-loading of images
+        logging.error("Scrolling to load all images...")
+        try:
+            # Scroll to bottom in increments
+            for _ in range(5):
+                await page.evaluate('window.scrollBy(0, window.innerHeight)')
+                await asyncio.sleep(0.5)
+            # Scroll back to top
+            await page.evaluate('window.scrollTo(0, 0)')
+            await asyncio.sleep(2)
+            logging.error("Scrolling complete, images should be loaded")
+        except Exception as e:
+            logging.error(f"Scrolling failed: {e}")
+
+        # Check for access restriction or no results in one page probe
+        page_state = await check_page_state(page)
+        if page_state == 'restricted':
+            logging.error("Bot detection detected - returning None for VPN retry")
+            return None  # Signal bot detection to worker for VPN retry
+
+        if page_state == 'empty':
+            logging.error("[CarGurus] No results found")
+            return []
+
+        # Try to find listings, then read them all in one call
+        selector = await find_listing_selector(page)
+        for i, row in enumerate(await read_listing_rows(page, selector, max_results)):
+            try:
+                listing = parse_listing_row(row, query, detect_trim=False)
+            except (AttributeError, KeyError, TypeError) as e:
+                logging.error(f"Error extracting listing {i}: {e}")
+                continue
+            if listing:
+                results.append(listing)
+
+        if results:
+            logging.error(f"Successfully extracted {len(results)} listings using search box")
+            return results
+        else:
+            logging.error("No listings extracted using search box")
+            return [{"error": f"No listings found for {query}"}]
+
+    except Exception as e:
+        logging.exception(f"Error using search box approach: {e}")
+        return [{"error": f"Search box approach failed: {str(e)}"}]
+
+
+async def scrape_cars_uncached(search_filters: dict, max_results: int = 10, browser=None):
+    """Run a CarGurus scrape for scrape_cars(), bypassing the results cache."""
     results = []
-    browser = None
+    owns_browser = browser is None
+    page = None
 
     # Extract filters with defaults
     make = search_filters.get('make', '')
@@ -457,205 +845,44 @@ async def scrape_cars(search_filters: dict, max_results: int = 10):
         trim = trim_val
 
     try:
-        # Launch Camoufox in headed mode with full xvfb resolution
-        # Use RAM-based profile for faster startup and cleanup
-        logging.error(f"Launching Camoufox for: {make} {model}")
-        logging.error("Display: {}".format(os.environ.get('DISPLAY', 'not set')))
-        browser = await AsyncCamoufox(
-            screen=Screen(max_width=1920, max_height=1080),  # Match xvfb resolution
-            headless=False,  # Use headed mode with xvfb
-            humanize=True,
-        ).__aenter__()
-
-        page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
-        logging.error("Browser launched, navigating to CarGurus homepage")
-        logging.error("Viewport set to 1920x1080")
-
-        # STEP 1: Try to discover make and model entity codes from homepage
-        # If that fails, use a direct text search URL instead
-
-        # First, try visiting homepage to discover entity codes
-        await page.goto("https://www.cargurus.com", wait_until='domcontentloaded', timeout=90000)
-        await asyncio.sleep(15)  # Give CarGurus more time to fully load (was 5s)
+        if owns_browser:
+            logging.error(f"Launching Camoufox for: {make} {model}")
+            browser = await launch_browser()
 
-        # Take screenshot for debugging
-        try:
-            await page.screenshot(path='/tmp/cargurus-homepage.png')
-            logging.error("Homepage screenshot saved")
-        except:
-            pass
+        page = await new_page(browser)
+        logging.error(f"Viewport set to {VIEWPORT['width']}x{VIEWPORT['height']}")
 
-        # STEP 2: Try to discover make and model entity codes
+        # STEP 1: Look up make and model entity codes in the cache. On a hit
+        # the homepage is never loaded and we go straight to the search URL.
         make_code = None
         model_code = None
-
         if make and model:
-            make_code, model_code = await discover_make_and_model_codes(page, make, model)
+            make_code, model_code = lookup_entity_codes(make, model)
+
+        if make_code and model_code:
+            logging.error(f"Using cached entity codes: {make_code}, {model_code}")
+        else:
+            # STEP 2: Visit homepage to discover entity codes
+            # If that fails, use a direct text search URL instead
+            logging.error("Navigating to CarGurus homepage")
+            await page.goto("https://www.cargurus.com", wait_until='domcontentloaded', timeout=90000)
+            # Continue as soon as the make dropdown or search box is usable
+            try:
+                await page.wait_for_selector(HOMEPAGE_READY_SELECTOR, timeout=15000)
+            except Exception:
+                logging.error("Homepage controls did not appear before timeout")
+
+            await debug_screenshot(page, 'homepage')
+
+            if make and model:
+                make_code, model_code = await discover_make_and_model_codes(page, make, model)
+                if make_code and model_code:
+                    store_entity_codes(make, model, make_code, model_code)
 
         # If dropdown discovery failed, use search box approach
         if not make_code or not model_code:
             logging.error(f"Could not discover entity codes, trying search box approach")
-
-            try:
-                # Look for search input box on the homepage
-                search_selectors = [
-                    'input[name="searchQuery"]',
-                    'input[placeholder*="search" i]',
-                    'input[type="search"]',
-                    '#search-input',
-                    '[data-test="search-input"]',
-                ]
-
-                search_input = None
-                for selector in search_selectors:
-                    try:
-                        search_input = await page.wait_for_selector(selector, timeout=15000)  # Increased from 5000
-                        if search_input:
-                            logging.error(f"Found search input with selector: {selector}")
-                            break
-                    except:
-                        continue
-
-                if not search_input:
-                    logging.error("Could not find search input on homepage - likely bot detection")
-                    await page.screenshot(path='/tmp/cargurus-no-search.png')
-                    return None  # Signal bot detection to worker for VPN retry
-
-                # Enter search query
-                search_query = f"{make} {model}"
-                await search_input.fill(search_query)
-                logging.error(f"Entered search query: {search_query}")
-                await asyncio.sleep(1)
-
-                # Submit search (press Enter)
-                await search_input.press('Enter')
-                logging.error("Submitted search")
-                await asyncio.sleep(10)
-
-                # Take screenshot of search results
-                await page.screenshot(path='/tmp/cargurus-search-results.png')
-                logging.error("Search results screenshot saved")
-
-                # Scroll to bottom to trigger lazy-loading of images
-                logging.error("Scrolling to load all images...")
-                try:
-                    # Scroll to bottom in increments
-                    for _ in range(5):
-                        await page.evaluate('window.scrollBy(0, window.innerHeight)')
-                        await asyncio.sleep(0.5)
-                    # Scroll back to top
-                    await page.evaluate('window.scrollTo(0, 0)')
-                    await asyncio.sleep(2)
-                    logging.error("Scrolling complete, images should be loaded")
-                except Exception as e:
-                    logging.error(f"Scrolling failed: {e}")
-
-                # Check for access restriction
-                page_text = await page.inner_text('body')
-                if any(indicator in page_text.lower() for indicator in ['access is temporarily restricted', 'bot detection', 'please verify you are human']):
-                    logging.error("Bot detection detected - returning None for VPN retry")
-                    return None  # Signal bot detection to worker for VPN retry
-
-                # Check for no results
-                if any(indicator in page_text for indicator in ['No matching vehicles', 'No results found', '0 results']):
-                    logging.error("[CarGurus] No results found")
-                    return []
-
-                # Try to find listings
-                selectors = [
-                    'a[href*="/details/"]',
-                    '[data-testid="listing-card"]',
-                    'article',
-                    '[class*="listing"]',
-                ]
-
-                listings = []
-                for selector in selectors:
-                    listings = await page.query_selector_all(selector)
-                    if listings:
-                        logging.error(f"Found {len(listings)} potential listings with selector: {selector}")
-                        break
-
-                # Extract data from listings
-                for i, listing in enumerate(listings[:max_results]):
-                    try:
-                        all_text = await listing.inner_text()
-                        name = f"{make} {model}"
-                        name_elem = await listing.query_selector('h4, h3, h2')
-                        if name_elem:
-                            name = await name_elem.inner_text()
-
-                        price = 0
-                        price_match = re.search(r'\$[\d,]+', all_text)
-                        if price_match:
-                            price = extract_number(price_match.group())
-
-                        mileage = 0
-                        mileage_match = re.search(r'([\d,]+)\s*(?:mi|miles)', all_text, re.IGNORECASE)
-                        if mileage_match:
-                            mileage = extract_number(mileage_match.group(1))
-
-                        image = ''
-                        # Try img tag first, then fallback to image tag, then SVG-embedded image
-                        img_elem = await listing.query_selector('img')
-                        if img_elem:
-                            image = await img_elem.get_attribute('src') or ''
-                        else:
-                            # Some listings use <image> instead of <img>
-                            image_elem = await listing.query_selector('image')
-                            if image_elem:
-                                image = await image_elem.get_attribute('src') or ''
-                            else:
-                                # Some listings use SVG with embedded <image> tag
-                                svg_image_elem = await listing.query_selector('svg image')
-                                if svg_image_elem:
-                                    image = await svg_image_elem.get_attribute('xlink:href') or ''
-
-                        url = ''
-                        tag_name = await listing.evaluate('el => el.tagName')
-                        if tag_name == 'A':
-                            url = await listing.get_attribute('href') or ''
-                        else:
-                            link_elem = await listing.query_selector('a[href*="/details/"]')
-                            if link_elem:
-                                url = await link_elem.get_attribute('href') or ''
-
-                        if url and not url.startswith('http'):
-                            url = f"https://www.cargurus.com{url}"
-
-                        location = 'Unknown'
-                        location_match = re.search(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2})', all_text)
-                        if location_match:
-                            location = f"{location_match.group(1)}, {location_match.group(2)}"
-
-                        if price > 0 or mileage > 0:
-                            results.append({
-                                'name': name.strip(),
-                                'price': price,
-                                'mileage': mileage,
-                                'trim': '',
-                                'image': image,
-                                'retailer': 'CarGurus',
-                                'url': url,
-                                'location': location
-                            })
-                            logging.error(f"Extracted: {name[:40]} - ${price} - {mileage} mi")
-                    except Exception as e:
-                        logging.error(f"Error extracting listing {i}: {e}")
-                        continue
-
-                if results:
-                    logging.error(f"Successfully extracted {len(results)} listings using search box")
-                    return results
-                else:
-                    logging.error("No listings extracted using search box")
-                    return [{"error": f"No listings found for {make} {model}"}]
-
-            except Exception as e:
-                logging.error(f"Error using search box approach: {e}")
-                import traceback
-                traceback.print_exc()
-                return [{"error": f"Search box approach failed: {str(e)}"}]
+            return await search_via_search_box(page, f"{make} {model}", max_results)
 
         # STEP 3: Build search URL with correct format (original entity code path)
         other_filters = {k: v for k, v in search_filters.items()
@@ -671,67 +898,30 @@ async def scrape_cars(search_filters: dict, max_results: int = 10):
         )
 
         logging.error(f"Navigating to: {search_url}")
-        await page.goto(search_url, wait_until='domcontentloaded', timeout=60000)
+        await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
 
         # Wait for results page to load
         logging.error("Results page loading, waiting for content...")
-        await asyncio.sleep(10)
-
-        try:
-            await page.wait_for_load_state('networkidle', timeout=10000)
-        except:
-            pass
+        await wait_for_results(page)
 
-        # Check for access restriction
-        page_text = await page.inner_text('body')
-        restricted_indicators = [
-            'access is temporarily restricted',
-            'Access restricted',
-            'suspicious activity',
-            'bot detection',
-            'please verify you are human'
-        ]
-        if any(indicator in page_text.lower() for indicator in restricted_indicators):
+        # Check for access restriction or no results in one page probe
+        page_state = await check_page_state(page)
+        if page_state == 'restricted':
             logging.error("[CarGurus] Access restricted by bot detection! - returning None for VPN retry")
-            try:
-                await page.screenshot(path='/tmp/cargurus-restricted.png')
-            except:
-                pass
+            await debug_screenshot(page, 'restricted')
             return None  # Signal bot detection to worker for VPN retry
 
         # Check for no results
-        no_results_indicators = [
-            'No matching vehicles',
-            'No results found',
-            '0 results',
-            'Try changing your search'
-        ]
-        if any(indicator in page_text for indicator in no_results_indicators):
+        if page_state == 'empty':
             logging.error("[CarGurus] No results found")
             return []
 
         # Try multiple selectors for listings
-        selectors = [
-            'a[href*="/details/"]',  # CarGurus links to car details
-            '[data-testid="listing-card"]',
-            'article',
-            '[class*="listing"]',
-        ]
-
-        listings = []
-        for selector in selectors:
-            listings = await page.query_selector_all(selector)
-            if listings:
-                logging.error(f"Found {len(listings)} potential listings with selector: {selector}")
-                break
+        selector = await find_listing_selector(page)
 
-        if not listings:
+        if not selector:
             logging.error("No listings found with any selector")
-            # Take screenshot for debugging
-            try:
-                await page.screenshot(path='/tmp/cargurus-debug.png')
-            except:
-                pass
+            await debug_screenshot(page, 'debug')
 
         # Scroll to bottom to trigger lazy-loading of images
         logging.error("Scrolling to load all images...")
@@ -742,119 +932,218 @@ async def scrape_cars(search_filters: dict, max_results: int = 10):
                 await asyncio.sleep(0.5)
             # Scroll back to top
             await page.evaluate('window.scrollTo(0, 0)')
-            # Wait longer for lazy-loaded content to finish loading
-            await asyncio.sleep(5)
+            # Give lazy-loaded attributes a moment to fill in. Images are
+            # blocked, so this only waits for src/data-src, not downloads.
+            await asyncio.sleep(2)
             logging.error("Scrolling complete, images should be loaded")
         except Exception as e:
             logging.error(f"Scrolling failed: {e}")
 
-        # Extract data from listings
-        for i, listing in enumerate(listings[:max_results]):
+        # Extract data from listings - one browser call for every card's fields
+        default_name = f"{make} {model}".strip() or 'Unknown'
+        for i, row in enumerate(await read_listing_rows(page, selector, max_results)):
             try:
-                # Get all text
-                all_text = await listing.inner_text()
-
-                # Extract name from heading or use search criteria
-                name = f"{make} {model}"
-                name_elem = await listing.query_selector('h4, h3, h2')
-                if name_elem:
-                    name = await name_elem.inner_text()
-
-                # Extract price
-                price = 0
-                price_match = re.search(r'\$[\d,]+', all_text)
-                if price_match:
-                    price = extract_number(price_match.group())
-
-                # Extract mileage
-                mileage = 0
-                mileage_match = re.search(r'([\d,]+)\s*(?:mi|miles)', all_text, re.IGNORECASE)
-                if mileage_match:
-                    mileage = extract_number(mileage_match.group(1))
-
-                # Extract image
-                image = ''
-                # Try img tag first, then fallback to image tag, then SVG-embedded image
-                img_elem = await listing.query_selector('img')
-                if img_elem:
-                    image = await img_elem.get_attribute('src') or ''
-                else:
-                    # Some listings use <image> instead of <img>
-                    image_elem = await listing.query_selector('image')
-                    if image_elem:
-                        image = await image_elem.get_attribute('src') or ''
-                    else:
-                        # Some listings use SVG with embedded <image> tag
-                        svg_image_elem = await listing.query_selector('svg image')
-                        if svg_image_elem:
-                            image = await svg_image_elem.get_attribute('xlink:href') or ''
-
-                # Extract URL
-                url = ''
-                tag_name = await listing.evaluate('el => el.tagName')
-                if tag_name == 'A':
-                    url = await listing.get_attribute('href') or ''
-                else:
-                    link_elem = await listing.query_selector('a[href*="/details/"]')
-                    if link_elem:
-                        url = await link_elem.get_attribute('href') or ''
-
-                if url and not url.startswith('http'):
-                    url = f"https://www.cargurus.com{url}"
-
-                # Extract location
-                location = 'Unknown'
-                location_match = re.search(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2})', all_text)
-                if location_match:
-                    location = f"{location_match.group(1)}, {location_match.group(2)}"
-
-                # Extract trim from text if available
-                trim_found = ''
-                trim_match = re.search(r'(Denali|SLE|SLT|AT4|Elevation)\s*\w*', all_text)
-                if trim_match:
-                    trim_found = trim_match.group(1)
-
-                if price > 0 or mileage > 0:
-                    results.append({
-                        'name': name.strip(),
-                        'price': price,
-                        'mileage': mileage,
-                        'trim': trim_found,
-                        'image': image,
-                        'retailer': 'CarGurus',
-                        'url': url,
-                        'location': location
-                    })
-                    logging.error(f"Extracted: {name[:40]} - ${price} - {mileage} mi")
-
-            except Exception as e:
+                listing = parse_listing_row(row, default_name)
+            except (AttributeError, KeyError, TypeError) as e:
                 logging.error(f"Error extracting listing {i}: {e}")
                 continue
+            if listing:
+                results.append(listing)
 
     except Exception as e:
-        logging.error(f"Scraping error: {e}")
-        import traceback
-        traceback.print_exc()
+        logging.exception(f"Scraping error: {e}")
+        # A failed scrape is not "no results" - it must not be cached as one
+        if not results:
+            results = [{"error": f"Scraping failed: {str(e)}"}]
 
     finally:
-        logging.error("Scraping complete, waiting 60 seconds before closing...")
-        await asyncio.sleep(10)
-
-        if browser:
-            try:
+        logging.error("Scraping complete, closing browser")
+        try:
+            if owns_browser and browser:
                 await browser.close()
-            except:
-                pass
+            elif page is not None:
+                await page.close()
+        except:
+            pass
+
+    return results
+
+
+async def scrape_cars(search_filters: dict, max_results: int = 10, browser=None):
+    """Scrape car listings from CarGurus using Camoufox
+
+    Args:
+        search_filters: Dict with make, model, zip, trim, etc.
+        max_results: Maximum number of results to return
+
+    Supported filters:
+        - make: Make name (e.g., 'GMC')
+        - model: Model name (e.g., 'Yukon')
+        - zip: ZIP code (default: '94002')
+        - distance: Search radius in miles (default: 200)
+        - trim: Trim name ONLY, no drivetrain suffix (e.g., 'Denali Ultimate', 'SLE', 'SLT', 'AT4')
+        - yearMin/yearMax: Year range
+        - minPrice/maxPrice: Price range
+        - exteriorColor/interiorColor: Color codes (BLACK, WHITE, GRAY, etc.)
+        - drivetrain: FOUR_WHEEL_DRIVE, ALL_WHEEL_DRIVE, FOUR_BY_TWO (separate from trim!)
+        - fuelType: GASOLINE, DIESEL, FLEX_FUEL_VEHICLE, etc.
+        - transmission: AUTOMATIC, MANUAL
+        - mileageMax: Maximum mileage
 
+    When a browser is passed in, the scrape runs in its own page which is
+    closed afterwards, leaving the browser running for the next query.
+    With CARGURUS_CACHE_TTL set, identical filters within that many seconds
+    are answered from the results cache without touching a browser.
+    """
+    cache_key = filters_cache_key(search_filters)
+    cached = RESULTS_CACHE.load(cache_key, max_results)
+    if cached is not None:
+        logging.error(f"Cache hit, returning {len(cached)} cached results")
+        return cached
+
+    results = await scrape_cars_uncached(search_filters, max_results, browser)
+    RESULTS_CACHE.store(cache_key, max_results, results)
     return results
 
 
+async def scrape_cars_fallback(query: str, max_results: int = 10, browser=None):
+    """Scrape CarGurus for a free-text query (e.g. 'GMC Sierra 3500HD')
+
+    Used when no make/model filters are available, so the entity-code search
+    URL can't be built; goes through the homepage search box instead. Returns
+    the same shapes as scrape_cars().
+    """
+    owns_browser = browser is None
+    page = None
+
+    try:
+        if owns_browser:
+            logging.error(f"Launching Camoufox for: {query}")
+            browser = await launch_browser()
+
+        page = await new_page(browser)
+        logging.error("Navigating to CarGurus homepage")
+        await page.goto("https://www.cargurus.com", wait_until='domcontentloaded', timeout=90000)
+        try:
+            await page.wait_for_selector(HOMEPAGE_READY_SELECTOR, timeout=15000)
+        except Exception:
+            logging.error("Homepage controls did not appear before timeout")
+
+        return await search_via_search_box(page, query, max_results)
+
+    finally:
+        try:
+            if owns_browser and browser:
+                await browser.close()
+            elif page is not None:
+                await page.close()
+        except:
+            pass
+
+
+def is_free_text_query(arg) -> bool:
+    """True for a bare search string rather than JSON filters."""
+    return isinstance(arg, str) and not arg.lstrip().startswith('{')
+
+
+def parse_filters(arg: str) -> dict:
+    """
+    Turn a CLI filters argument into scrape_cars() filters.
+
+    Accepts plain filter JSON (or an already-decoded dict), structured JSON
+    from parse_vehicle_query.py or the LLM search_query format. Raises
+    json.JSONDecodeError on bad JSON.
+    """
+    if isinstance(arg, str):
+        filters = json_loads(arg)
+    else:
+        filters = arg
+
+    # Check if this is a structured format from parse_vehicle_query.py
+    if 'structured' in filters:
+        # Use adapter to convert structured to CarGurus params
+        filters = adapt_structured_to_cargurus(filters['structured'])
+
+    # Handle LLM search_query format: {"search_query": "GMC Sierra 3500HD Denali Ultimate", "years": "2023-2024", ...}
+    if 'search_query' in filters and 'make' not in filters:
+        sq = filters['search_query']
+        parts = sq.split()
+        # Known trim keywords to split model from trim
+        trim_keywords = {'Denali', 'AT4', 'SLE', 'SLT', 'Elevation', 'Pro', 'Base', 'Limited', 'Platinum', 'Canyon'}
+        if parts:
+            filters['make'] = parts[0]
+            model_parts = []
+            trim_parts = []
+            for part in parts[1:]:
+                if part in trim_keywords or trim_parts:
+                    trim_parts.append(part)
+                else:
+                    model_parts.append(part)
+            if model_parts:
+                filters['model'] = ' '.join(model_parts)
+            if trim_parts:
+                filters['trim'] = ' '.join(trim_parts)
+        logging.error(f"Parsed search_query: make={filters.get('make')}, model={filters.get('model')}, trim={filters.get('trim')}")
+
+    # Convert "years" format "2023-2024" to yearMin/yearMax
+    if 'years' in filters and 'yearMin' not in filters:
+        years_str = str(filters.pop('years'))
+        if '-' in years_str:
+            year_parts = years_str.split('-')
+            filters['yearMin'] = int(year_parts[0])
+            filters['yearMax'] = int(year_parts[1])
+
+    # Convert string values to int where needed
+    if 'distance' in filters:
+        filters['distance'] = int(filters['distance'])
+    if 'maxPrice' in filters:
+        filters['maxPrice'] = int(filters['maxPrice'])
+    if 'minPrice' in filters:
+        filters['minPrice'] = int(filters['minPrice'])
+
+    return filters
+
+
+async def serve(concurrency: int = SERVE_CONCURRENCY):
+    """
+    Long-lived mode: keep one browser warm and answer many queries.
+
+    Reads one JSON request per stdin line, e.g.
+    {"id": "job-1", "filters": <same as the CLI filters argument>, "max_results": 10}
+    and writes one JSON line per request, {"id": ..., "results": [...]} or
+    {"id": ..., "error": "..."}. Responses may arrive out of order; at most
+    `concurrency` scrapes share the browser at once.
+    """
+    browser = await launch_browser()
+
+    async def scrape(request: dict):
+        filters = request["filters"]
+        max_results = int(request.get("max_results", 10))
+        if is_free_text_query(filters):
+            result = await scrape_cars_fallback(filters, max_results, browser=browser)
+        else:
+            result = await scrape_cars(parse_filters(filters), max_results, browser=browser)
+        if result is None:
+            raise RuntimeError("Bot detection - retry with VPN")
+        return result
+
+    try:
+        await serve_jsonl(scrape, concurrency)
+    finally:
+        await browser.close()
+
+
 async def main():
     """Main entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        await serve()
+        return
+
     if len(sys.argv) < 2:
         print(json.dumps({
-            "error": "Usage: scrape-cargurus.py <JSON filters or structured> [max_results]",
+            "error": "Usage: scrape-cargurus.py <JSON filters, structured or search text> [max_results] | scrape-cargurus.py --serve",
             "examples": [
+                'GMC Sierra 3500HD',
                 '{"make": "GMC", "model": "Yukon", "zip": "94002", "trim": "Denali Ultimate"}',
                 '{"structured": {"makes": ["GMC"], "models": ["Sierra"]}}'  # From parse_vehicle_query.py"
             ]
@@ -865,51 +1154,10 @@ async def main():
     max_results = int(sys.argv[2]) if len(sys.argv) > 2 else 10
 
     try:
-        filters = json.loads(arg) if isinstance(arg, str) else arg
-
-        # Check if this is a structured format from parse_vehicle_query.py
-        if 'structured' in filters:
-            # Use adapter to convert structured to CarGurus params
-            filters = adapt_structured_to_cargurus(filters['structured'])
-
-        # Handle LLM search_query format: {"search_query": "GMC Sierra 3500HD Denali Ultimate", "years": "2023-2024", ...}
-        if 'search_query' in filters and 'make' not in filters:
-            sq = filters['search_query']
-            parts = sq.split()
-            # Known trim keywords to split model from trim
-            trim_keywords = {'Denali', 'AT4', 'SLE', 'SLT', 'Elevation', 'Pro', 'Base', 'Limited', 'Platinum', 'Canyon'}
-            if parts:
-                filters['make'] = parts[0]
-                model_parts = []
-                trim_parts = []
-                for part in parts[1:]:
-                    if part in trim_keywords or trim_parts:
-                        trim_parts.append(part)
-                    else:
-                        model_parts.append(part)
-                if model_parts:
-                    filters['model'] = ' '.join(model_parts)
-                if trim_parts:
-                    filters['trim'] = ' '.join(trim_parts)
-            logging.error(f"Parsed search_query: make={filters.get('make')}, model={filters.get('model')}, trim={filters.get('trim')}")
-
-        # Convert "years" format "2023-2024" to yearMin/yearMax
-        if 'years' in filters and 'yearMin' not in filters:
-            years_str = str(filters.pop('years'))
-            if '-' in years_str:
-                year_parts = years_str.split('-')
-                filters['yearMin'] = int(year_parts[0])
-                filters['yearMax'] = int(year_parts[1])
-
-        # Convert string values to int where needed
-        if 'distance' in filters:
-            filters['distance'] = int(filters['distance'])
-        if 'maxPrice' in filters:
-            filters['maxPrice'] = int(filters['maxPrice'])
-        if 'minPrice' in filters:
-            filters['minPrice'] = int(filters['minPrice'])
-
-        result = await scrape_cars(filters, max_results)
+        if is_free_text_query(arg):
+            result = await scrape_cars_fallback(arg, max_results)
+        else:
+            result = await scrape_cars(parse_filters(arg), max_results)
 
         # Handle different return types
         # - None: bot detection (worker will retry with VPN)
@@ -924,14 +1172,15 @@ async def main():
             print("[]")
             sys.stdout.flush()
         else:
-            # Success - return listings
-            output = json.dumps(result, indent=2)
-            print(output)
+            # Success - return listings (compact: indentation roughly doubles the payload)
+            output = json_dumps(result)
+            sys.stdout.buffer.write(output + b'\n')
             sys.stdout.flush()
-            # Also write to temp file as backup
-            with open(f"/tmp/scraper_output_{os.getpid()}.json", "w") as f:
-                f.write(output)
-                f.flush()
+            # Also write to temp file as backup - the worker reads it if stdout
+            # comes back empty; SCRAPER_BACKUP_OUTPUT=0 skips it
+            if os.environ.get('SCRAPER_BACKUP_OUTPUT', '1') != '0':
+                with open(f"/tmp/scraper_output_{os.getpid()}.json", "wb") as f:
+                    f.write(output)
     except json.JSONDecodeError:
         print(json.dumps({"error": "Invalid JSON filters"}))
         sys.stdout.flush()
@@ -17,81 +17,155 @@ logging.basicConfig(level=logging.ERROR, format='%(message)s', stream=sys.stderr
 from camoufox.async_api import AsyncCamoufox
 from dotenv import load_dotenv
 
+# carmax_core reads its CARMAX_* settings at import time, so .env must be
+# loaded first
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+from carmax_core import scrape_carmax as scrape_carmax_core
+from scraper_common import block_unneeded_resources, json_dumps, serve_jsonl
+
+# Patterns applied to every listing card
+NON_NUMERIC_RE = re.compile(r'[^\d,.]')
+PRICE_RE = re.compile(r'\$[\d,]+')
+MILEAGE_RE = re.compile(r'([\d,]+)\s*(?:mi|miles)', re.IGNORECASE)
+LOCATION_RE = re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2})')
+
+# Max searches sharing the browser at once in --serve mode
+SERVE_CONCURRENCY = 2
+# Seconds to wait for every site. Once one has listings, sites still running
+# at the soft deadline are dropped; otherwise they get the grace period.
+SOFT_DEADLINE = 20
+STRAGGLER_GRACE = 15
+
+SEARCH_INPUT_SELECTOR = 'input[type="search"], input[placeholder*="Search"]'
+# Any of these appearing means a site's results have rendered
+CARGURUS_RESULTS_SELECTOR = '[data-testid="listing-card"], [data-cg-ft="srp-listing-blade"], article'
+CARVANA_RESULTS_SELECTOR = '[data-test*="result"], [class*="vehicle"], article'
+# Card lists to try in order, and name elements to try in order within a card
+CARGURUS_CARD_SELECTORS = ['[data-testid="listing-card"]', '[class*="listing"]', 'article']
+CARGURUS_NAME_SELECTORS = ['h4', 'h3', 'h2']
+CARVANA_CARD_SELECTORS = [CARVANA_RESULTS_SELECTOR]
+CARVANA_NAME_SELECTORS = ['h2', 'h3', '[data-test*="title"]']
+# Image URL of an <img>. Images are blocked, so lazy loaders may never copy
+# data-src/srcset into src; fall back to those attributes.
+IMAGE_URL_JS = """el => el.getAttribute('src') || el.getAttribute('data-src')
+    || (el.getAttribute('srcset') || el.getAttribute('data-srcset') || '').trim().split(/\\s+/)[0]"""
+# Reads the cards of the first matching card selector in one browser call,
+# stopping at maxResults cards that show a price (PRICE_RE's pattern).
+# Returns {count, rows} with rows of {text, name, image, href}.
+CARD_ROWS_JS = """([cardSelectors, nameSelectors, maxResults, pricePattern]) => {
+    const hasPrice = new RegExp(pricePattern);
+    const imageUrl = """ + IMAGE_URL_JS + """;
+    for (const selector of cardSelectors) {
+        const cards = document.querySelectorAll(selector);
+        if (!cards.length) continue;
+        const rows = [];
+        for (const card of cards) {
+            if (rows.length >= maxResults) break;
+            const text = card.innerText;
+            // Priceless cards are dropped in Python anyway, so skip them here
+            if (!hasPrice.test(text)) continue;
+            let name = null;
+            for (const nameSelector of nameSelectors) {
+                const elem = card.querySelector(nameSelector);
+                if (elem) { name = elem.innerText; break; }
+            }
+            const img = card.querySelector('img');
+            const link = card.querySelector('a');
+            rows.push({
+                text: text,
+                name: name,
+                image: img ? imageUrl(img) : '',
+                href: link ? link.getAttribute('href') : '',
+            });
+        }
+        return {count: cards.length, rows: rows};
+    }
+    return {count: 0, rows: []};
+}"""
+
+
+async def wait_for(page, selector: str, timeout: int) -> bool:
+    """Wait until selector is attached; False on timeout instead of raising."""
+    try:
+        await page.wait_for_selector(selector, timeout=timeout, state='attached')
+        return True
+    except Exception:
+        return False
+
+
+async def submit_search(page, search_input, query: str) -> None:
+    """Type query, press Enter and wait for the page to move to the results URL."""
+    start_url = page.url
+    await search_input.fill(query)
+    await page.keyboard.press('Enter')
+    # The start page can already contain cards, so a selector wait alone
+    # could resolve before the search has navigated
+    try:
+        await page.wait_for_function('url => location.href !== url', arg=start_url, timeout=8000)
+    except Exception:
+        pass
+
 
 def extract_number(text: str) -> int:
     """Extract number from text like '$20,000' or '20,000 mi'"""
     if not text:
         return 0
-    cleaned = re.sub(r'[^\d,.]', '', text)
-    cleaned = cleaned.replace(',', '')
+    # Fast path for PRICE_RE matches like '$20,000': no regex pass needed
+    cleaned = text.replace('$', '').replace(',', '')
+    if cleaned.isascii() and cleaned.isdigit():
+        return int(cleaned)
+    cleaned = NON_NUMERIC_RE.sub('', cleaned)
     try:
-        return int(float(cleaned))
+        # Prices and mileages are whole numbers, so skip the float round-trip
+        return int(cleaned) if '.' not in cleaned else int(float(cleaned))
     except (ValueError, AttributeError):
         return 0
 
 
-async def scrape_cargurus(browser, query: str, max_results: int = 5) -> List[Dict]:
+async def scrape_cargurus(context, query: str, max_results: int = 5) -> List[Dict]:
     """Scrape CarGurus"""
     results = []
-    page = await browser.new_page()
+    page = await context.new_page()
 
     try:
         logging.error(f"[CarGurus] Searching for: {query}")
         await page.goto("https://www.cargurus.com", wait_until='domcontentloaded', timeout=30000)
-        await asyncio.sleep(2)
+        await wait_for(page, SEARCH_INPUT_SELECTOR, 5000)
 
         # Search
-        search_input = await page.query_selector('input[type="search"], input[placeholder*="Search"]')
+        search_input = await page.query_selector(SEARCH_INPUT_SELECTOR)
         if search_input:
-            await search_input.fill(query)
-            await page.keyboard.press('Enter')
-            await asyncio.sleep(5)
+            await submit_search(page, search_input, query)
         else:
             # Direct URL fallback
             search_url = f"https://www.cargurus.com/Cars/inventorylisting/viewDetailsFilterViewInventoryListing.action?zip=90210&distance=50000#searchText={query.replace(' ', '%20')}"
             await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(5)
-
-        # Find listings
-        selectors = ['[data-testid="listing-card"]', '[class*="listing"]', 'article']
-        listings = []
-        for selector in selectors:
-            listings = await page.query_selector_all(selector)
-            if listings:
-                break
+        # On timeout the selectors below simply find nothing
+        await wait_for(page, CARGURUS_RESULTS_SELECTOR, 8000)
 
-        logging.error(f"[CarGurus] Found {len(listings)} listings")
+        # Find listings and read all their fields in one browser call
+        cards = await page.evaluate(CARD_ROWS_JS, [CARGURUS_CARD_SELECTORS, CARGURUS_NAME_SELECTORS, max_results, PRICE_RE.pattern])
+        logging.error(f"[CarGurus] Found {cards['count']} listings")
 
-        for i, listing in enumerate(listings[:max_results]):
+        for i, row in enumerate(cards['rows']):
             try:
-                all_text = await listing.inner_text()
+                all_text = row['text'] or ''
+                name = row['name'] or query
 
-                # Extract data
-                name = query
-                for sel in ['h4', 'h3', 'h2']:
-                    elem = await listing.query_selector(sel)
-                    if elem:
-                        name = await elem.inner_text()
-                        break
-
-                price_match = re.search(r'\$[\d,]+', all_text)
+                price_match = PRICE_RE.search(all_text)
                 price = extract_number(price_match.group()) if price_match else 0
 
-                mileage_match = re.search(r'([\d,]+)\s*(?:mi|miles)', all_text, re.IGNORECASE)
+                mileage_match = MILEAGE_RE.search(all_text)
                 mileage = extract_number(mileage_match.group()) if mileage_match else 0
 
-                img_elem = await listing.query_selector('img')
-                image = await img_elem.get_attribute('src') if img_elem else ''
-
-                link_elem = await listing.query_selector('a')
-                url = await link_elem.get_attribute('href') if link_elem else ''
+                image = row['image'] or ''
+                url = row['href'] or ''
                 if url and not url.startswith('http'):
                     url = f"https://www.cargurus.com{url}"
 
-                location_match = re.search(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*),\s*([A-Z]{2})', all_text)
+                location_match = LOCATION_RE.search(all_text)
                 location = f"{location_match.group(1)}, {location_match.group(2)}" if location_match else 'Unknown'
 
                 if price > 0:
@@ -116,113 +190,46 @@ async def scrape_cargurus(browser, query: str, max_results: int = 5) -> List[Dic
     return results
 
 
-async def scrape_carmax(browser, query: str, max_results: int = 5) -> List[Dict]:
-    """Scrape CarMax"""
-    results = []
-    page = await browser.new_page()
-
-    try:
-        logging.error(f"[CarMax] Searching for: {query}")
-
-        # CarMax search URL
-        search_url = f"https://www.carmax.com/cars/all?search={query.replace(' ', '+')}"
-        await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
-        await asyncio.sleep(5)
-
-        # Find listings
-        listings = await page.query_selector_all('article, [data-test*="result"], [class*="vehicle-card"]')
-        logging.error(f"[CarMax] Found {len(listings)} listings")
-
-        for i, listing in enumerate(listings[:max_results]):
-            try:
-                all_text = await listing.inner_text()
-
-                name = query
-                for sel in ['h2', 'h3', '[class*="title"]']:
-                    elem = await listing.query_selector(sel)
-                    if elem:
-                        name = await elem.inner_text()
-                        break
-
-                price_match = re.search(r'\$[\d,]+', all_text)
-                price = extract_number(price_match.group()) if price_match else 0
+async def scrape_carmax(context, query: str, max_results: int = 5) -> List[Dict]:
+    """Scrape CarMax (shares the scraping logic in carmax_core)"""
+    # carmax_core only calls new_page() on it, which a context also provides
+    return await scrape_carmax_core(query, max_results, browser=context)
 
-                mileage_match = re.search(r'([\d,]+)\s*(?:mi|miles)', all_text, re.IGNORECASE)
-                mileage = extract_number(mileage_match.group()) if mileage_match else 0
-
-                img_elem = await listing.query_selector('img')
-                image = await img_elem.get_attribute('src') if img_elem else ''
-
-                link_elem = await listing.query_selector('a')
-                url = await link_elem.get_attribute('href') if link_elem else ''
-                if url and not url.startswith('http'):
-                    url = f"https://www.carmax.com{url}"
 
-                if price > 0:
-                    results.append({
-                        'name': name.strip()[:100],
-                        'price': price,
-                        'mileage': mileage,
-                        'image': image,
-                        'retailer': 'CarMax',
-                        'url': url,
-                        'location': 'Multiple Locations'
-                    })
-
-            except Exception as e:
-                logging.error(f"[CarMax] Error extracting listing {i}: {e}")
-
-    except Exception as e:
-        logging.error(f"[CarMax] Error: {e}")
-    finally:
-        await page.close()
-
-    return results
-
-
-async def scrape_carvana(browser, query: str, max_results: int = 5) -> List[Dict]:
+async def scrape_carvana(context, query: str, max_results: int = 5) -> List[Dict]:
     """Scrape Carvana"""
     results = []
-    page = await browser.new_page()
+    page = await context.new_page()
 
     try:
         logging.error(f"[Carvana] Searching for: {query}")
 
         await page.goto("https://www.carvana.com/cars", wait_until='domcontentloaded', timeout=30000)
-        await asyncio.sleep(3)
+        await wait_for(page, SEARCH_INPUT_SELECTOR, 5000)
 
         # Try search
-        search_input = await page.query_selector('input[type="search"], input[placeholder*="Search"]')
+        search_input = await page.query_selector(SEARCH_INPUT_SELECTOR)
         if search_input:
-            await search_input.fill(query)
-            await page.keyboard.press('Enter')
-            await asyncio.sleep(5)
+            await submit_search(page, search_input, query)
+            await wait_for(page, CARVANA_RESULTS_SELECTOR, 8000)
 
-        listings = await page.query_selector_all('[data-test*="result"], [class*="vehicle"], article')
-        logging.error(f"[Carvana] Found {len(listings)} listings")
+        # Read every card's fields in one browser call
+        cards = await page.evaluate(CARD_ROWS_JS, [CARVANA_CARD_SELECTORS, CARVANA_NAME_SELECTORS, max_results, PRICE_RE.pattern])
+        logging.error(f"[Carvana] Found {cards['count']} listings")
 
-        for i, listing in enumerate(listings[:max_results]):
+        for i, row in enumerate(cards['rows']):
             try:
-                all_text = await listing.inner_text()
-
-                name = query
-                for sel in ['h2', 'h3', '[data-test*="title"]']:
-                    elem = await listing.query_selector(sel)
-                    if elem:
-                        name = await elem.inner_text()
-                        break
+                all_text = row['text'] or ''
+                name = row['name'] or query
 
-                price_match = re.search(r'\$[\d,]+', all_text)
+                price_match = PRICE_RE.search(all_text)
                 price = extract_number(price_match.group()) if price_match else 0
 
-                mileage_match = re.search(r'([\d,]+)\s*(?:mi|miles)', all_text, re.IGNORECASE)
+                mileage_match = MILEAGE_RE.search(all_text)
                 mileage = extract_number(mileage_match.group()) if mileage_match else 0
 
-                img_elem = await listing.query_selector('img')
-                image = await img_elem.get_attribute('src') if img_elem else ''
-
-                link_elem = await listing.query_selector('a')
-                url = await link_elem.get_attribute('href') if link_elem else ''
+                image = row['image'] or ''
+                url = row['href'] or ''
                 if url and not url.startswith('http'):
                     url = f"https://www.carvana.com{url}"
 
@@ -248,48 +255,107 @@ async def scrape_carvana(browser, query: str, max_results: int = 5) -> List[Dict
     return results
 
 
-async def scrape_all_sites(query: str, max_per_site: int = 5):
-    """Scrape all 6 sites in parallel"""
+async def launch_browser():
+    """Start the Camoufox browser shared by every site scraper."""
+    return await AsyncCamoufox(headless=True, humanize=True).__aenter__()
+
+
+async def scrape_all_sites(query: str, max_per_site: int = 5, browser=None):
+    """Scrape all 6 sites in parallel
 
-    browser = await AsyncCamoufox(headless=True, humanize=True).__aenter__()
+    When a browser is passed in, only this search's contexts are closed
+    afterwards, leaving the browser running for the next query.
+    """
+    owns_browser = browser is None
+    if owns_browser:
+        browser = await launch_browser()
+    contexts = []
 
     try:
+        # One context per site keeps cookies apart, while every page a site
+        # opens (CarMax opens several) shares its cookies and HTTP cache
+        contexts = await asyncio.gather(*[browser.new_context() for _ in range(3)])
+        cargurus_context, carmax_context, carvana_context = contexts
+        # Only text and image URLs are scraped, so images, media, fonts and
+        # trackers are never downloaded
+        await asyncio.gather(*[context.route('**/*', block_unneeded_resources) for context in contexts])
+
         # Run scrapers in parallel
-        results = await asyncio.gather(
-            scrape_cargurus(browser, query, max_per_site),
-            scrape_carmax(browser, query, max_per_site),
-            scrape_carvana(browser, query, max_per_site),
-            return_exceptions=True
-        )
-
-        # Flatten results
+        tasks = {
+            asyncio.create_task(scrape_cargurus(cargurus_context, query, max_per_site)): 'CarGurus',
+            asyncio.create_task(scrape_carmax(carmax_context, query, max_per_site)): 'CarMax',
+            asyncio.create_task(scrape_carvana(carvana_context, query, max_per_site)): 'Carvana',
+        }
         all_results = []
-        for result in results:
-            if isinstance(result, list):
-                all_results.extend(result)
-            elif isinstance(result, Exception):
-                logging.error(f"Site error: {result}")
-
-        # Deduplicate by URL
-        seen_urls = set()
-        unique_results = []
+
+        def collect(done):
+            for task in done:
+                if task.exception() is not None:
+                    logging.error(f"Site error ({tasks[task]}): {task.exception()}")
+                elif isinstance(task.result(), list):
+                    all_results.extend(task.result())
+
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=SOFT_DEADLINE)
+            collect(done)
+            # A slow site only holds up the response while nothing has come back
+            if pending and not all_results:
+                done, pending = await asyncio.wait(pending, timeout=STRAGGLER_GRACE)
+                collect(done)
+            for task in pending:
+                logging.error(f"[{tasks[task]}] Still running after the deadline, dropping it")
+        finally:
+            # Let cancelled scrapers close their pages before the contexts go
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Deduplicate by URL, keeping the first copy; listings without a URL
+        # are kept too, deduplicated by retailer, name and price
+        unique_results = {}
         for item in all_results:
-            if item['url'] and item['url'] not in seen_urls:
-                seen_urls.add(item['url'])
-                unique_results.append(item)
+            key = item.get('url') or f"{item.get('retailer')}|{item.get('name')}|{item.get('price')}"
+            unique_results.setdefault(key, item)
+
+        # Sort by price (best deals first), unpriced listings last
+        return sorted(unique_results.values(), key=lambda x: x['price'] or float('inf'))
 
-        # Sort by price (best deals first)
-        unique_results.sort(key=lambda x: x['price'])
+    finally:
+        for context in contexts:
+            await context.close()
+        if owns_browser:
+            await browser.close()
+
+
+async def serve(concurrency: int = SERVE_CONCURRENCY):
+    """
+    Long-lived mode: keep one browser warm and answer many queries.
 
-        return unique_results
+    Reads one JSON request per stdin line, e.g.
+    {"id": "job-1", "query": "honda civic", "max_per_site": 5}
+    and writes one JSON line per request, {"id": ..., "results": [...]} or
+    {"id": ..., "error": "..."}. Responses may arrive out of order; at most
+    `concurrency` searches share the browser at once. Each search gets fresh
+    contexts, so nothing piles up in the browser between requests.
+    """
+    browser = await launch_browser()
 
+    async def scrape(request: dict):
+        return await scrape_all_sites(request["query"], int(request.get("max_per_site", 5)), browser=browser)
+
+    try:
+        await serve_jsonl(scrape, concurrency)
     finally:
         await browser.close()
 
 
 async def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        await serve()
+        return
+
     if len(sys.argv) < 2:
-        print(json.dumps({"error": "Usage: scrape-cars-multisite.py <search query>"}))
+        print(json.dumps({"error": "Usage: scrape-cars-multisite.py <search query> | scrape-cars-multisite.py --serve"}))
         sys.exit(1)
 
     query = sys.argv[1]
@@ -303,7 +369,8 @@ async def main():
             print(json.dumps({"error": f"No listings found for '{query}' across any sites"}))
         else:
             logging.error(f"✅ Found {len(results)} total listings across all sites")
-            print(json.dumps(results, indent=2))
+            sys.stdout.buffer.write(json_dumps(results, indent=True) + b'\n')
+            sys.stdout.flush()
 
     except Exception as e:
         logging.error(f"Fatal error: {e}")
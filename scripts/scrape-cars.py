@@ -28,6 +28,39 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+# raw_decode parses one JSON value at an offset and ignores whatever follows
+JSON_DECODER = json.JSONDecoder()
+
+
+def decode_first_array(text: str):
+    """Decode the first "[{" offset in text that parses as JSON, or None."""
+    start = text.find('[{')
+    while start != -1:
+        try:
+            value, _ = JSON_DECODER.raw_decode(text, start)
+            return value
+        except ValueError:
+            start = text.find('[{', start + 1)
+    return None
+
+
+def extract_json_array(text: str):
+    """
+    Return the first JSON array of objects embedded in text, or None.
+
+    Handles arrays whose quotes the agent escaped (e.g. [{\\"name\\": ...}])
+    and trailing prose after the array, without regex backtracking. Escaped
+    arrays are tried first; if none decodes, the original text is scanned.
+    """
+    escaped_start = text.find('[{\\"')
+    if escaped_start != -1:
+        unescaped = text[escaped_start:].replace('\\"', '"').replace('\\\\', '\\')
+        value = decode_first_array(unescaped)
+        if value is not None:
+            return value
+
+    return decode_first_array(text)
+
 
 async def scrape_cars(query: str, max_results: int = 3):
     """Scrape car listings from CarGurus AND AutoTrader - optimized for minimal credit usage"""
@@ -75,27 +108,10 @@ async def scrape_cars(query: str, max_results: int = 3):
         else:
             result_str = str(result)
 
-        # Try to extract JSON from the result string
-        # Look for JSON array pattern (handle escaped quotes)
-        import re
-
-        # Try escaped JSON first (common in agent responses)
-        escaped_match = re.search(r'\[\{\\\".*?\\\"\}\]', result_str, re.DOTALL)
-        if escaped_match:
-            try:
-                # Unescape the JSON
-                json_str = escaped_match.group().replace('\\"', '"').replace('\\\\', '\\')
-                return json.loads(json_str)
-            except:
-                pass
-
-        # Try regular JSON
-        json_match = re.search(r'\[{.*?}\]', result_str, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except:
-                pass
+        # Extract the JSON array from the result string (escaped or not)
+        listings = extract_json_array(result_str)
+        if listings is not None:
+            return listings
 
         # If no JSON found, try to parse the whole thing
         try:
@@ -10,17 +10,18 @@ import sys
 import tempfile
 import logging
 import re
-import traceback
 from pathlib import Path
 from typing import Optional, List, Dict
 
 logging.basicConfig(level=logging.ERROR, format='%(message)s', stream=sys.stderr)
 
 from camoufox.async_api import AsyncCamoufox
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
 
 # Import model name mappings
 from model_mappings import normalize_model_for_site
+from scraper_common import block_unneeded_resources, json_dumps, json_loads, serve_jsonl
 
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
@@ -29,11 +30,91 @@ load_dotenv(env_path)
 PROFILE_DIR = "/tmp/scraper_profile"
 os.makedirs(PROFILE_DIR, exist_ok=True)
 
+# Full HD so the whole filter panel is visible
+VIEWPORT = {'width': 1920, 'height': 1080}
+# Camoufox's humanized cursor adds latency to every click in the filter
+# walk, so it's off unless CARVANA_HUMANIZE is set (e.g. to debug a block)
+HUMANIZE = bool(os.environ.get('CARVANA_HUMANIZE', ''))
+
+# Max concurrent scrapes sharing the browser in --serve and --batch modes
+SERVE_CONCURRENCY = 2
+
+# Filter checkboxes (makes, models and trims all use the same component)
+CHECKBOX_LABEL_SELECTOR = 'label[class*="Checkbox-module_checkbox"]'
+CHECKBOX_TEXT_SELECTOR = 'span[class*="Checkbox-module_label"]'
+# Text of every checkbox label ('' where a label has no text span)
+LABEL_TEXTS_JS = """([labelSelector, textSelector]) => Array.from(document.querySelectorAll(labelSelector)).map(label => {
+    const span = label.querySelector(textSelector);
+    return span ? span.innerText.trim() : '';
+})"""
+
+# True once the number of checkbox labels differs from count (a panel opened/expanded)
+LABEL_COUNT_CHANGED_JS = "([selector, count]) => document.querySelectorAll(selector).length !== count"
+
+# Result cards link to the vehicle detail page
+LISTING_SELECTOR = 'a[href*="/vehicle/"]'
+# Text, link and image of the first maxResults distinct, priced cards, plus
+# the total card count. Stops walking the cards once enough are collected
+LISTING_ROWS_JS = """(els, [maxResults, pricePattern]) => {
+    const hasPrice = new RegExp(pricePattern);
+    const seen = new Set();
+    const rows = [];
+    for (const el of els) {
+        if (rows.length >= maxResults) break;
+        const href = el.getAttribute('href') || '';
+        // A card can hold several links to the same vehicle
+        if (seen.has(href)) continue;
+        const text = el.innerText;
+        // Priceless cards are dropped in Python anyway, so they don't use up a slot
+        if (!hasPrice.test(text)) continue;
+        seen.add(href);
+        const img = el.querySelector('img');
+        rows.push({text, href, img: img ? (img.getAttribute('src') || '') : ''});
+    }
+    return {count: els.length, rows};
+}"""
+
+# Raw text of every JSON-LD block on the page
+JSON_LD_JS = """() => Array.from(document.querySelectorAll('script[type="application/ld+json"]'), s => s.textContent)"""
+# schema.org types that describe a single vehicle for sale
+VEHICLE_LD_TYPES = {'Product', 'Vehicle', 'Car'}
+
+NO_RESULTS_INDICATORS = [
+    'No matching vehicles',
+    'No results found',
+    '0 results',
+    'No cars found',
+    'Try changing your search',
+    'No exact matches',
+]
+NO_RESULTS_RE = re.compile('|'.join(map(re.escape, NO_RESULTS_INDICATORS)))
+# Checked in the page so only a boolean crosses back, not the whole body text
+NO_RESULTS_JS = "(pattern) => new RegExp(pattern).test(document.body.innerText)"
+# 'listings' once a result card renders, 'empty' once no-results copy shows, else keep polling
+RESULTS_READY_JS = """([listingSelector, noResultsPattern]) => {
+    if (document.querySelector(listingSelector)) return 'listings';
+    if (new RegExp(noResultsPattern).test(document.body.innerText)) return 'empty';
+    return false;
+}"""
+
+# Compiled once; these run on every line of every listing card
+NON_NUMERIC_RE = re.compile(r'[^\d,.]')
+YEAR_RE = re.compile(r'\b(\d{4})\b')
+PRICE_LINE_RE = re.compile(r'^\$\d+')
+MILES_LINE_RE = re.compile(r'\d+k?\s*miles$', re.IGNORECASE)
+SKIP_LINE_RE = re.compile(
+    r'^(Estimated|Get it|Free shipping|Cash down|mo|Purchase|Recent|Price Drop|Great Deal|Favorite|On hold|©|Carvana, LLC stock image|Pre-order now|Purchase in progress)',
+    re.IGNORECASE,
+)
+PRICE_RE = re.compile(r'\$\s*([\d,]+)')
+MILEAGE_RE = re.compile(r'(\d+[,\d]*)\s*k?\s*miles', re.IGNORECASE)
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
 
 def extract_number(text: str) -> int:
     if not text:
         return 0
-    cleaned = re.sub(r'[^\d,.]', '', str(text))
+    cleaned = NON_NUMERIC_RE.sub('', str(text))
     cleaned = cleaned.replace(',', '')
     try:
         return int(float(cleaned))
@@ -41,6 +122,177 @@ def extract_number(text: str) -> int:
         return 0
 
 
+def iter_ld_nodes(node):
+    """Yield every JSON-LD object in node, descending into lists, @graph and ItemList entries."""
+    if isinstance(node, list):
+        for item in node:
+            yield from iter_ld_nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ('@graph', 'itemListElement'):
+            if key in node:
+                yield from iter_ld_nodes(node[key])
+        # ListItem wraps the actual thing in "item"
+        if isinstance(node.get('item'), (dict, list)):
+            yield from iter_ld_nodes(node['item'])
+
+
+def ld_first(value):
+    """First element of a JSON-LD list value, or the value itself."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def ld_str(value) -> str:
+    """value if it is a string, else '' (JSON-LD fields may be objects or lists)."""
+    return value if isinstance(value, str) else ''
+
+
+def ld_number(value) -> int:
+    """Numeric JSON-LD value (number, string or QuantitativeValue object) as an int."""
+    if isinstance(value, dict):
+        value = value.get('value')
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return 0
+    return extract_number(value)
+
+
+def compact_text(text: str) -> str:
+    """Lowercase text with everything but letters and digits removed, for loose name matching."""
+    return NON_ALNUM_RE.sub('', text.lower())
+
+
+def parse_ld_vehicle(node: dict) -> Optional[Dict]:
+    """Turn one schema.org Product/Vehicle/Car object into a listing; None without a price."""
+    types = node.get('@type')
+    types = set(types) if isinstance(types, list) else {types}
+    if not types & VEHICLE_LD_TYPES:
+        return None
+
+    offers = ld_first(node.get('offers'))
+    if not isinstance(offers, dict):
+        offers = {}
+    price = ld_number(offers.get('price'))
+    if price <= 0:
+        return None
+
+    mileage = ld_number(node.get('mileageFromOdometer'))
+
+    image = ld_first(node.get('image'))
+    if isinstance(image, dict):
+        image = image.get('url')
+
+    url = ld_str(node.get('url')) or ld_str(offers.get('url'))
+    if url and not url.startswith('http'):
+        url = f"https://www.carvana.com{url}"
+
+    return {
+        'name': ld_str(node.get('name')).strip(),
+        'price': price,
+        'mileage': mileage,
+        'image': ld_str(image),
+        'retailer': 'Carvana',
+        'url': url,
+        'location': 'Carvana'
+    }
+
+
+def parse_json_ld_listings(
+    blocks: List[str],
+    max_results: int,
+    required: List[str] = (),
+    trims: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Listings from the page's JSON-LD blocks (see JSON_LD_JS), up to max_results.
+
+    The filters are applied by clicking, so the embedded data isn't guaranteed
+    to reflect them (it may describe the unfiltered /cars page). Only vehicles
+    whose name contains every non-empty string in `required` (the selected
+    make and model) and, when `trims` is given, at least one of the trims
+    are kept; names are compared with compact_text.
+    """
+    required = [compact_text(term) for term in required if term]
+    trims = [compact_text(trim) for trim in trims or () if trim]
+    results = []
+    for block in blocks:
+        try:
+            data = json_loads(block)
+        except (TypeError, ValueError):
+            continue
+        for node in iter_ld_nodes(data):
+            if len(results) >= max_results:
+                return results
+            try:
+                listing = parse_ld_vehicle(node)
+            except (AttributeError, TypeError, ValueError):
+                # One malformed object shouldn't cost the rest of the block
+                continue
+            if not listing or not listing['name']:
+                continue
+            name = compact_text(listing['name'])
+            if not all(term in name for term in required):
+                continue
+            if trims and not any(trim in name for trim in trims):
+                continue
+            results.append(listing)
+    return results
+
+
+async def read_label_texts(page) -> List[str]:
+    """Snapshot every filter checkbox label's text in one browser call."""
+    return await page.evaluate(LABEL_TEXTS_JS, [CHECKBOX_LABEL_SELECTOR, CHECKBOX_TEXT_SELECTOR])
+
+
+async def click_label(page, text: str) -> None:
+    """
+    Click the filter checkbox label whose text is exactly `text`.
+
+    The match runs in the browser at click time, so it still finds the right
+    label if the list re-rendered since read_label_texts (e.g. after
+    another option was ticked).
+    """
+    exact_text = re.compile(rf'^\s*{re.escape(text)}\s*$')
+    await page.locator(CHECKBOX_LABEL_SELECTOR).filter(
+        has=page.locator(CHECKBOX_TEXT_SELECTOR, has_text=exact_text)
+    ).first.click(timeout=5000)
+
+
+async def wait_for_label_change(page, previous_count: int, timeout: int = 5000) -> None:
+    """Wait until the checkbox label count moves off previous_count (new options rendered)."""
+    try:
+        await page.wait_for_function(
+            LABEL_COUNT_CHANGED_JS, arg=[CHECKBOX_LABEL_SELECTOR, previous_count], timeout=timeout
+        )
+    except PlaywrightTimeoutError:
+        logging.error(f"[Carvana] Filter options did not change within {timeout}ms")
+
+
+async def wait_for_settle(page, timeout: int = 2000) -> None:
+    """Give a filter click's results request a bounded chance to finish."""
+    try:
+        await page.wait_for_load_state('networkidle', timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+
+
+async def wait_for_results(page) -> Optional[str]:
+    """
+    Wait until result cards render or the page says there are no results.
+
+    Returns 'listings', 'empty' or None on timeout.
+    """
+    try:
+        ready = await page.wait_for_function(
+            RESULTS_READY_JS, arg=[LISTING_SELECTOR, NO_RESULTS_RE.pattern], timeout=15000, polling=250
+        )
+        return await ready.json_value()
+    except PlaywrightTimeoutError:
+        logging.error("[Carvana] Timeout waiting for results")
+        return None
+
+
 def adapt_structured_to_carvana_interactive(structured: dict) -> dict:
     """
     Convert structured query format to Carvana interactive-specific parameters.
@@ -88,12 +340,76 @@ def adapt_structured_to_carvana_interactive(structured: dict) -> dict:
     return params
 
 
+def parse_filters(arg) -> dict:
+    """
+    Turn a CLI filters argument into scrape_carvana_interactive() filters.
+
+    Accepts plain filter JSON (or an already-decoded dict), structured JSON
+    from parse_vehicle_query.py or the LLM search_query format. Raises
+    json.JSONDecodeError on bad JSON.
+    """
+    if isinstance(arg, str):
+        filters = json_loads(arg)
+    else:
+        filters = arg
+
+    # Check if this is a structured format from parse_vehicle_query.py
+    if 'structured' in filters:
+        # Use adapter to convert structured to Carvana interactive params
+        filters = adapt_structured_to_carvana_interactive(filters['structured'])
+        logging.error(f"[Carvana] Adapter returned: {filters}")
+
+    # Handle LLM search_query format: {"search_query": "GMC Sierra 3500HD Denali Ultimate", ...}
+    if 'search_query' in filters and 'make' not in filters:
+        sq = filters['search_query']
+        parts = sq.split()
+        # Split make, model, and trim using known trim keywords
+        trim_keywords = {'Denali', 'AT4', 'SLE', 'SLT', 'Elevation', 'Pro', 'Limited', 'Platinum', 'Canyon'}
+        if parts:
+            filters['make'] = parts[0]
+            model_parts = []
+            trim_parts = []
+            for part in parts[1:]:
+                if part in trim_keywords or trim_parts:
+                    trim_parts.append(part)
+                else:
+                    model_parts.append(part)
+            if model_parts:
+                raw_model = ' '.join(model_parts)
+                filters['model'] = normalize_model_for_site(raw_model, 'carvana')
+            if trim_parts:
+                # Use just the first keyword for broad matching (selects all Denali variants)
+                filters['trims'] = [trim_parts[0]]
+        logging.error(f"[Carvana] Parsed search_query: make={filters.get('make')}, model={filters.get('model')}, trims={filters.get('trims')}")
+
+    # Convert year_min/year_max to year (Carvana scraper uses single year)
+    if 'year_min' in filters and 'year' not in filters:
+        filters['year'] = int(filters['year_max']) if filters.get('year_max') else int(filters['year_min'])
+
+    return filters
+
+
+async def launch_browser():
+    """Start Camoufox configured for the Carvana filter walk."""
+    # IMPORTANT: headless=False because camoufox crashes in headless mode (run under xvfb)
+    return await AsyncCamoufox(
+        # Open the window at page size instead of resizing from the OS default
+        window=(VIEWPORT['width'], VIEWPORT['height']),
+        headless=False,
+        humanize=HUMANIZE,
+        # Only image URLs are scraped, never the pixels
+        block_images=True,
+        block_webrtc=True,
+    ).__aenter__()
+
+
 async def scrape_carvana_interactive(
     make: Optional[str] = None,
     model: Optional[str] = None,
     trims: Optional[List[str]] = None,
     year: Optional[int] = None,
-    max_results: int = 10
+    max_results: int = 10,
+    browser=None,
 ):
     """
     Scrape Carvana by interacting with filter UI elements
@@ -104,31 +420,30 @@ async def scrape_carvana_interactive(
         trims: List of trim names to filter (e.g., ["Denali", "AT4"])
         year: Model year
         max_results: Maximum number of results to return
+        browser: Already-running browser to scrape in (left open); a new
+            one is launched and closed when omitted
 
     NOTE: Model names use SPACES not hyphens (e.g., "Sierra 3500" NOT "Sierra-3500")
     NOTE: The "HD" suffix appears in vehicle titles but is NOT part of the model filter
     """
     results = []
 
-    # Use RAM-based profile for faster startup and cleanup
-    browser = await AsyncCamoufox(
-        headless=False,
-        humanize=True,
-    ).__aenter__()
+    owns_browser = browser is None
+    if owns_browser:
+        browser = await launch_browser()
+    # Each scrape gets its own context so concurrent filter walks in a shared
+    # browser don't see each other's cookies or saved filters
+    context = None
 
     try:
-        # Use full HD resolution for better visibility of filters
-        page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
-
-        # Resize window using JavaScript to ensure full width
-        await page.evaluate("window.resizeTo(1920, 1080)")
-        await page.set_viewport_size({'width': 1920, 'height': 1080})
-        logging.error(f"[Carvana] Window and viewport resized to 1920x1080")
+        context = await browser.new_context(viewport=VIEWPORT)
+        page = await context.new_page()
+        # Fonts, media and ad/analytics beacons never feed a scraped field
+        await page.route('**/*', block_unneeded_resources)
 
         # Start at Carvana search page
         logging.error(f"[Carvana] Starting search")
         await page.goto("https://www.carvana.com/cars", wait_until='domcontentloaded', timeout=60000)
-        await asyncio.sleep(3)
 
         # Step 1: Click "Make & Model" filter button to expand filters
         logging.error(f"[Carvana] Clicking Make & Model filter")
@@ -137,7 +452,7 @@ async def scrape_carvana_interactive(
             make_model_button = await page.wait_for_selector('[data-testid="facet-make-model"] > div', timeout=10000)
             if make_model_button:
                 await make_model_button.click()
-                await asyncio.sleep(2)
+                await page.wait_for_selector(CHECKBOX_LABEL_SELECTOR, state='visible', timeout=10000)
                 logging.error(f"[Carvana] Make & Model filter opened")
             else:
                 logging.error(f"[Carvana] Could not find Make & Model button")
@@ -151,25 +466,16 @@ async def scrape_carvana_interactive(
             try:
                 make_clicked = False
 
-                # Get all label elements (the clickable checkboxes)
-                # Labels contain the span with text, and clicking the label clicks the checkbox
-                all_labels = await page.query_selector_all('label[class*="Checkbox-module_checkbox"]')
-                logging.error(f"[Carvana] Found {len(all_labels)} checkbox labels")
+                # Read every label's text in one call; clicking the label clicks the checkbox
+                labels = await read_label_texts(page)
+                logging.error(f"[Carvana] Found {len(labels)} checkbox labels")
 
-                for label in all_labels:
-                    try:
-                        # Get the span inside the label that contains the text
-                        span = await label.query_selector('span[class*="Checkbox-module_label"]')
-                        if span:
-                            text = (await span.inner_text()).strip()
-                            if text == make:
-                                await label.click(timeout=5000)
-                                await asyncio.sleep(2)
-                                logging.error(f"[Carvana] Selected make: {make} (clicked label)")
-                                make_clicked = True
-                                break
-                    except Exception as inner_e:
-                        continue
+                if make in labels:
+                    await click_label(page, make)
+                    # The make's models are added to the list once it is selected
+                    await wait_for_label_change(page, len(labels))
+                    logging.error(f"[Carvana] Selected make: {make} (clicked label)")
+                    make_clicked = True
 
                 if not make_clicked:
                     logging.error(f"[Carvana] Could not find/click make: {make}")
@@ -183,72 +489,53 @@ async def scrape_carvana_interactive(
             search_model = model
             logging.error(f"[Carvana] Selecting model: {search_model}")
             try:
-                # Wait for Models section to appear after make is selected
-                await asyncio.sleep(1)
-
                 model_clicked = False
 
-                # Same approach: Get all label elements and find exact text match
-                all_labels = await page.query_selector_all('label[class*="Checkbox-module_checkbox"]')
-                logging.error(f"[Carvana] Found {len(all_labels)} checkbox labels for model search")
+                # Same approach: read every label's text once and find exact text match
+                labels = await read_label_texts(page)
+                logging.error(f"[Carvana] Found {len(labels)} checkbox labels for model search")
 
-                for label in all_labels:
-                    try:
-                        # Get the span inside the label that contains the text
-                        span = await label.query_selector('span[class*="Checkbox-module_label"]')
-                        if span:
-                            text = (await span.inner_text()).strip()
-                            if text == search_model:
-                                await label.click(timeout=5000)
-                                await asyncio.sleep(2)
-                                logging.error(f"[Carvana] Selected model: {search_model} (clicked label)")
-                                model_clicked = True
-                                break
-                    except Exception as inner_e:
-                        continue
+                if search_model in labels:
+                    await click_label(page, search_model)
+                    await wait_for_settle(page)
+                    logging.error(f"[Carvana] Selected model: {search_model} (clicked label)")
+                    model_clicked = True
 
-                # If exact match not found, try fuzzy match
+                # If exact match not found, try fuzzy match against the same snapshot
                 if not model_clicked:
                     logging.error(f"[Carvana] Could not find exact model '{search_model}', trying fuzzy match...")
 
-                    for label in all_labels:
+                    model_lower = search_model.lower()
+                    # Strategy 1: Remove HD/Hd from model to find base
+                    # "Sierra 3500HD" -> "Sierra 3500"
+                    base_model = model_lower.replace('hd', '').replace('-', ' ').strip()
+
+                    for text in labels:
+                        if not text:
+                            continue
+                        text_lower = text.lower()
+
+                        if base_model == text_lower:
+                            match_kind = 'fuzzy'
+                        # Strategy 2: Check if model is a prefix of available model
+                        # "Sierra 3500" matches "Sierra 3500 Crew Cab"
+                        elif text_lower.startswith(model_lower + ' '):
+                            match_kind = 'prefix'
+                        # Strategy 3: Check if available model is a prefix of requested model
+                        # "Sierra 3500" matches "Sierra 3500HD"
+                        elif model_lower.startswith(text_lower + ' ') or model_lower.startswith(text_lower + '-'):
+                            match_kind = 'prefix'
+                        else:
+                            continue
+
                         try:
-                            span = await label.query_selector('span[class*="Checkbox-module_label"]')
-                            if span:
-                                text = (await span.inner_text()).strip()
-                                # Try various fuzzy matching strategies
-                                model_lower = search_model.lower()
-                                text_lower = text.lower()
-
-                                # Strategy 1: Remove HD/Hd from model to find base
-                                # "Sierra 3500HD" -> "Sierra 3500"
-                                base_model = model_lower.replace('hd', '').replace('hd', '').replace('-', ' ').strip()
-                                if base_model == text_lower or text_lower == base_model:
-                                    await label.click(timeout=5000)
-                                    await asyncio.sleep(2)
-                                    logging.error(f"[Carvana] Selected fuzzy model match: '{text}' (for '{search_model}')")
-                                    model_clicked = True
-                                    break
-
-                                # Strategy 2: Check if model is a prefix of available model
-                                # "Sierra 3500" matches "Sierra 3500 Crew Cab"
-                                if text_lower.startswith(model_lower + ' '):
-                                    await label.click(timeout=5000)
-                                    await asyncio.sleep(2)
-                                    logging.error(f"[Carvana] Selected prefix model match: '{text}' (for '{search_model}')")
-                                    model_clicked = True
-                                    break
-
-                                # Strategy 3: Check if available model is a prefix of requested model
-                                # "Sierra 3500" matches "Sierra 3500HD"
-                                if model_lower.startswith(text_lower + ' ') or model_lower.startswith(text_lower + '-'):
-                                    await label.click(timeout=5000)
-                                    await asyncio.sleep(2)
-                                    logging.error(f"[Carvana] Selected prefix model match: '{text}' (for '{search_model}')")
-                                    model_clicked = True
-                                    break
-                        except Exception as inner_e:
+                            await click_label(page, text)
+                        except Exception:
                             continue
+                        await wait_for_settle(page)
+                        logging.error(f"[Carvana] Selected {match_kind} model match: '{text}' (for '{search_model}')")
+                        model_clicked = True
+                        break
 
                 if not model_clicked:
                     logging.error(f"[Carvana] Could not find/click model: {search_model}")
@@ -264,7 +551,6 @@ async def scrape_carvana_interactive(
         # Note: Trim button only appears after a model is selected
         if trims and len(trims) > 0:
             logging.error(f"[Carvana] Looking for Trim filter")
-            await asyncio.sleep(2)  # Wait for UI to update
 
             try:
                 # Trim button has same structure as Make & Model button
@@ -274,12 +560,13 @@ async def scrape_carvana_interactive(
                 ]
 
                 trim_button_clicked = False
+                label_count = await page.locator(CHECKBOX_LABEL_SELECTOR).count()
                 for selector in trim_button_selectors:
                     try:
                         trim_button = await page.wait_for_selector(selector, timeout=5000)
                         if trim_button:
                             await trim_button.click()
-                            await asyncio.sleep(2)
+                            await wait_for_label_change(page, label_count)
                             logging.error(f"[Carvana] Trim filter opened (selector: {selector})")
                             trim_button_clicked = True
                             break
@@ -287,19 +574,21 @@ async def scrape_carvana_interactive(
                         continue
 
                 if trim_button_clicked:
-                    # Get all label elements (the clickable checkboxes)
-                    all_label_elements = await page.query_selector_all('label[class*="Checkbox-module_checkbox"]')
+                    # Snapshot every label's text once; all matching below runs against
+                    # this in-memory list
                     available_trims = []
-                    for label in all_label_elements:
-                        try:
-                            # Get the span inside the label that contains the text
-                            span = await label.query_selector('span[class*="Checkbox-module_label"]')
-                            if span:
-                                text = (await span.inner_text()).strip()
-                                if text:
-                                    available_trims.append({'text': text, 'element': label})  # Store label for clicking
-                        except:
-                            continue
+                    for text in await read_label_texts(page):
+                        if text:
+                            lower = text.lower()
+                            available_trims.append({
+                                'text': text,
+                                'lower': lower,
+                                'first_word': lower.split()[0],
+                            })
+                    # Lowercased text -> first trim with that text, for exact lookups
+                    exact_index = {}
+                    for available in available_trims:
+                        exact_index.setdefault(available['lower'], available)
 
                     logging.error(f"[Carvana] Found {len(available_trims)} available trim options")
 
@@ -309,19 +598,16 @@ async def scrape_carvana_interactive(
                     # Try to find and click trim options with fuzzy matching
                     for trim in trims:
                         logging.error(f"[Carvana] Looking for trim: {trim}")
+                        trim_lower = trim.lower()
 
                         # Stage 1: Try exact match first (for specific trims like "Denali Ultimate")
-                        exact_match = None
-                        for available in available_trims:
-                            if available['text'].lower() == trim.lower():
-                                exact_match = available
-                                break
+                        exact_match = exact_index.get(trim_lower)
 
                         if exact_match:
                             try:
-                                await exact_match['element'].click()  # Click the label
+                                await click_label(page, exact_match['text'])
                                 clicked_trims.add(exact_match['text'])
-                                await asyncio.sleep(1)
+                                await wait_for_settle(page, 1000)
                                 logging.error(f"[Carvana] Selected exact trim match: '{exact_match['text']}'")
                             except Exception as e:
                                 logging.error(f"[Carvana] Error clicking exact match: {e}")
@@ -336,17 +622,16 @@ async def scrape_carvana_interactive(
                                 continue
 
                             # Check if trim name is a prefix or appears at start of available trim
-                            available_lower = available['text'].lower()
-                            trim_lower = trim.lower()
+                            available_lower = available['lower']
 
                             # Prefix match (forward): "Denali" matches "Denali 6 1/2 ft"
                             # Prefix match (reverse): "Denali Ultimate" matches "Denali"
                             if (available_lower.startswith(trim_lower + ' ') or available_lower.startswith(trim_lower + '-') or
                                 trim_lower.startswith(available_lower + ' ') or trim_lower.startswith(available_lower + '-')):
                                 try:
-                                    await available['element'].click()  # Click the label
+                                    await click_label(page, available['text'])
                                     clicked_trims.add(available['text'])
-                                    await asyncio.sleep(1)
+                                    await wait_for_settle(page, 1000)
                                     logging.error(f"[Carvana] Selected prefix trim match: '{available['text']}' (from '{trim}')")
                                     matched = True
                                 except Exception as e:
@@ -363,15 +648,12 @@ async def scrape_carvana_interactive(
                                     if available['text'] in clicked_trims:
                                         continue
 
-                                    available_lower = available['text'].lower()
-                                    available_first_word = available_lower.split()[0] if available_lower.split() else ''
-
                                     # First word match: "Denali Ultimate" matches "Denali 6 1/2 ft"
-                                    if available_first_word == trim_first_word:
+                                    if available['first_word'] == trim_first_word:
                                         try:
-                                            await available['element'].click()  # Click the label
+                                            await click_label(page, available['text'])
                                             clicked_trims.add(available['text'])
-                                            await asyncio.sleep(1)
+                                            await wait_for_settle(page, 1000)
                                             logging.error(f"[Carvana] Selected first-word fallback match: '{available['text']}' (from '{trim}')")
                                             matched = True
                                         except Exception as e:
@@ -382,41 +664,44 @@ async def scrape_carvana_interactive(
 
                 # Click outside to close dropdown
                 await page.mouse.click(100, 100)
-                await asyncio.sleep(2)
 
             except Exception as e:
                 logging.error(f"[Carvana] Error with trim selection: {e}")
 
-        # Wait for results to load
-        await asyncio.sleep(5)
-
-        # Check for "No results found" condition
-        page_text = await page.inner_text('body')
-        no_results_indicators = [
-            'No matching vehicles',
-            'No results found',
-            '0 results',
-            'No cars found',
-            'Try changing your search',
-            'No exact matches'
-        ]
-        if any(indicator in page_text for indicator in no_results_indicators):
+        # Let the last filter's results request land, then wait for cards
+        # (or the no-results message) instead of a fixed delay
+        await wait_for_settle(page, 5000)
+        state = await wait_for_results(page)
+
+        # Check for "No results found" condition. Cards can render alongside
+        # the copy (e.g. suggestions under "No exact matches"), so a card
+        # showing up doesn't rule it out
+        if state == 'empty' or await page.evaluate(NO_RESULTS_JS, NO_RESULTS_RE.pattern):
             logging.error(f"[Carvana] No results found - returning empty")
             return []
 
-        # Extract listings
-        listings = await page.query_selector_all('a[href*="/vehicle/"]')
-        logging.error(f"[Carvana] Found {len(listings)} listing links")
+        # Prefer the structured schema.org data when the page embeds it and it
+        # describes the selected make/model/trims; otherwise read the cards
+        results = parse_json_ld_listings(await page.evaluate(JSON_LD_JS), max_results, [make, model], trims)
+        if results:
+            logging.error(f"[Carvana] Extracted {len(results)} listings from JSON-LD")
+            return results
+
+        # Extract listings (one browser call for every card)
+        listings = await page.eval_on_selector_all(LISTING_SELECTOR, LISTING_ROWS_JS, [max_results, PRICE_RE.pattern])
+        logging.error(f"[Carvana] Found {listings['count']} listing links")
 
-        for i, listing in enumerate(listings[:max_results]):
+        for i, row in enumerate(listings['rows']):
+            if len(results) >= max_results:
+                break
             try:
-                all_text = await listing.inner_text()
-                url = await listing.get_attribute('href') or ''
+                all_text = row['text'] or ''
+                url = row['href']
                 if url and not url.startswith('http'):
                     url = f"https://www.carvana.com{url}"
 
                 # Extract year
-                year_match = re.search(r'\b(\d{4})\b', all_text)
+                year_match = YEAR_RE.search(all_text)
                 found_year = year_match.group(1) if year_match else ''
 
                 # Build title from all text
@@ -425,11 +710,11 @@ async def scrape_carvana_interactive(
                 title = ''
                 for line in lines:
                     # Skip non-vehicle lines
-                    if re.search(r'^\$\d+', line):
+                    if PRICE_LINE_RE.search(line):
                         continue
-                    if re.search(r'\d+k?\s*miles$', line, re.IGNORECASE):
+                    if MILES_LINE_RE.search(line):
                         continue
-                    if re.search(r'^(Estimated|Get it|Free shipping|Cash down|mo|Purchase|Recent|Price Drop|Great Deal|Favorite|On hold|©|Carvana, LLC stock image|Pre-order now|Purchase in progress)', line, re.IGNORECASE):
+                    if SKIP_LINE_RE.search(line):
                         continue
                     if line in ['Audi', 'BMW', 'Chevrolet', 'Ford', 'GMC', 'Honda', 'Toyota', 'Mercedes-Benz', 'Ram', 'Jeep']:
                         continue
@@ -443,20 +728,18 @@ async def scrape_carvana_interactive(
                     title = f"{make or ''} {model or ''}".strip()
 
                 # Extract price
-                price_match = re.search(r'\$\s*([\d,]+)', all_text)
+                price_match = PRICE_RE.search(all_text)
                 price = extract_number(price_match.group(1)) if price_match else 0
 
                 # Extract mileage
-                mileage_match = re.search(r'(\d+[,\d]*)\s*k?\s*miles', all_text, re.IGNORECASE)
+                mileage_match = MILEAGE_RE.search(all_text)
                 mileage = 0
                 if mileage_match:
                     mileage = extract_number(mileage_match.group(1))
                     if 'k' in mileage_match.group(0).lower():
                         mileage = mileage * 1000
 
-                # Get image
-                img_elem = await listing.query_selector('img')
-                image = await img_elem.get_attribute('src') or '' if img_elem else ''
+                image = row['img']
 
                 if price > 0:
                     results.append({
@@ -475,20 +758,100 @@ async def scrape_carvana_interactive(
                 continue
 
     except Exception as e:
-        logging.error(f"[Carvana] Scraping error: {e}")
-        import traceback
-        traceback.print_exc()
+        logging.exception(f"[Carvana] Scraping error: {e}")
 
     finally:
-        await browser.close()
+        if owns_browser:
+            await browser.close()
+        elif context is not None:
+            await context.close()
 
     return results
 
 
+async def scrape_many(jobs: List[dict], concurrency: int = SERVE_CONCURRENCY, browser=None) -> List:
+    """
+    Run several scrapes concurrently in one browser.
+
+    Each job is {"filters": <same as the CLI filters argument>, "max_results": 10}.
+    Returns one entry per job, in order: its listings, or {"error": "..."}
+    if that job failed. At most `concurrency` scrapes run at once.
+    """
+    owns_browser = browser is None
+    if owns_browser:
+        browser = await launch_browser()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(job: dict):
+        try:
+            filters = parse_filters(job["filters"])
+            async with semaphore:
+                return await scrape_carvana_interactive(
+                    make=filters.get('make'),
+                    model=filters.get('model'),
+                    trims=filters.get('trims'),
+                    year=filters.get('year'),
+                    max_results=int(job.get("max_results", 10)),
+                    browser=browser,
+                )
+        except Exception as e:
+            return {"error": str(e)}
+
+    try:
+        return await asyncio.gather(*(one(job) for job in jobs))
+    finally:
+        if owns_browser:
+            await browser.close()
+
+
+async def serve(concurrency: int = SERVE_CONCURRENCY):
+    """
+    Long-lived mode: keep one browser warm and answer many queries.
+
+    Reads one JSON request per stdin line, e.g.
+    {"id": "job-1", "filters": <same as the CLI filters argument>, "max_results": 10}
+    and writes one JSON line per request, {"id": ..., "results": [...]} or
+    {"id": ..., "error": "..."}. Responses may arrive out of order; at most
+    `concurrency` scrapes share the browser at once.
+    """
+    browser = await launch_browser()
+
+    async def scrape(request: dict):
+        filters = parse_filters(request["filters"])
+        return await scrape_carvana_interactive(
+            make=filters.get('make'),
+            model=filters.get('model'),
+            trims=filters.get('trims'),
+            year=filters.get('year'),
+            max_results=int(request.get("max_results", 10)),
+            browser=browser,
+        )
+
+    try:
+        await serve_jsonl(scrape, concurrency)
+    finally:
+        await browser.close()
+
+
 async def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        await serve()
+        return
+
+    if len(sys.argv) > 2 and sys.argv[1] == '--batch':
+        try:
+            with open(sys.argv[2]) as f:
+                jobs = json.load(f)
+            sys.stdout.buffer.write(json_dumps(await scrape_many(jobs), indent=True) + b'\n')
+            sys.stdout.flush()
+        except Exception as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        return
+
     if len(sys.argv) < 2:
         print(json.dumps({
-            "error": "Usage: scrape-carvana-interactive.py <JSON filters or structured> [max_results]",
+            "error": "Usage: scrape-carvana-interactive.py <JSON filters or structured> [max_results] | scrape-carvana-interactive.py --serve | scrape-carvana-interactive.py --batch <jobs.json>",
             "examples": [
                 '{"make": "GMC", "model": "Sierra 3500", "trims": ["Denali"]}',
                 "'{\"structured\": {...}}'  # From parse_vehicle_query.py"
@@ -497,42 +860,9 @@ async def main():
         sys.exit(1)
 
     try:
-        filters = json.loads(sys.argv[1])
+        filters = parse_filters(sys.argv[1])
         max_results = int(sys.argv[2]) if len(sys.argv) > 2 else 10
 
-        # Check if this is a structured format from parse_vehicle_query.py
-        if 'structured' in filters:
-            # Use adapter to convert structured to Carvana interactive params
-            filters = adapt_structured_to_carvana_interactive(filters['structured'])
-            logging.error(f"[Carvana] Adapter returned: {filters}")
-
-        # Handle LLM search_query format: {"search_query": "GMC Sierra 3500HD Denali Ultimate", ...}
-        if 'search_query' in filters and 'make' not in filters:
-            sq = filters['search_query']
-            parts = sq.split()
-            # Split make, model, and trim using known trim keywords
-            trim_keywords = {'Denali', 'AT4', 'SLE', 'SLT', 'Elevation', 'Pro', 'Limited', 'Platinum', 'Canyon'}
-            if parts:
-                filters['make'] = parts[0]
-                model_parts = []
-                trim_parts = []
-                for part in parts[1:]:
-                    if part in trim_keywords or trim_parts:
-                        trim_parts.append(part)
-                    else:
-                        model_parts.append(part)
-                if model_parts:
-                    raw_model = ' '.join(model_parts)
-                    filters['model'] = normalize_model_for_site(raw_model, 'carvana')
-                if trim_parts:
-                    # Use just the first keyword for broad matching (selects all Denali variants)
-                    filters['trims'] = [trim_parts[0]]
-            logging.error(f"[Carvana] Parsed search_query: make={filters.get('make')}, model={filters.get('model')}, trims={filters.get('trims')}")
-
-        # Convert year_min/year_max to year (Carvana scraper uses single year)
-        if 'year_min' in filters and 'year' not in filters:
-            filters['year'] = int(filters['year_max']) if filters.get('year_max') else int(filters['year_min'])
-
         logging.error(f"[Carvana] Calling scrape_carvana_interactive with make={filters.get('make')}, model={filters.get('model')}, trims={filters.get('trims')}, year={filters.get('year')}")
 
         result = await scrape_carvana_interactive(
@@ -547,13 +877,19 @@ async def main():
             print(json.dumps({"error": "No Carvana listings found"}))
             sys.stdout.flush()
         else:
-            output = json.dumps(result, indent=2)
-            print(output)
+            output = json_dumps(result, indent=True)
+            # Also write to temp file as backup - the worker reads it if stdout
+            # comes back empty; the disk write overlaps the stdout write, and
+            # SCRAPER_BACKUP_OUTPUT=0 skips it
+            backup = None
+            if os.environ.get('SCRAPER_BACKUP_OUTPUT', '1') != '0':
+                backup = asyncio.create_task(asyncio.to_thread(
+                    Path(f"/tmp/scraper_output_{os.getpid()}.json").write_bytes, output
+                ))
+            sys.stdout.buffer.write(output + b'\n')
             sys.stdout.flush()
-            # Also write to temp file as backup
-            with open(f"/tmp/scraper_output_{os.getpid()}.json", "w") as f:
-                f.write(output)
-                f.flush()
+            if backup is not None:
+                await backup
     except json.JSONDecodeError as e:
         print(json.dumps({"error": f"Invalid JSON filters: {e}"}))
         sys.stdout.flush()
@@ -0,0 +1,191 @@
+"""
+Helpers shared by the site scrapers.
+
+Nothing here is tied to one retailer or imports a browser, so any scraper
+can use it without pulling in another site's configuration.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# orjson is optional; stdlib json is the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_loads(data):
+    """
+    Decode JSON from str or bytes, with orjson when available.
+
+    Bad input raises json.JSONDecodeError either way (orjson's decode error
+    subclasses it).
+    """
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+
+def json_dumps(obj, indent: bool = False, sort_keys: bool = False, default=None) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, with orjson when available; indent means 2 spaces."""
+    if ORJSON_AVAILABLE:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=default, option=option or None)
+    return json.dumps(obj, indent=2 if indent else None, sort_keys=sort_keys, default=default).encode()
+
+# Network requests aborted during scraping
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+BLOCKED_DOMAINS = (
+    'doubleclick.net',
+    'googletagmanager',
+    'google-analytics',
+    'facebook.com',
+    'segment.io',
+    'optimizely',
+)
+
+
+async def block_unneeded_resources(route) -> None:
+    """
+    Abort requests that never feed a scraped field.
+
+    Images are only read as src strings from the DOM, so their bytes are
+    never needed; fonts, media and ad/analytics beacons are pure overhead.
+    Install with page.route('**/*', block_unneeded_resources).
+    """
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(domain in request.url for domain in BLOCKED_DOMAINS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class _NumericCharsTable(dict):
+    """str.translate table that keeps digits and '.' and deletes every other character."""
+
+    def __missing__(self, codepoint):
+        return None
+
+
+NUMERIC_CHARS_TABLE = _NumericCharsTable({ord(c): ord(c) for c in '0123456789.'})
+
+
+def extract_number(text: str) -> int:
+    """Extract number from text like '$20,000', '20,000 mi' or '113K mi'; text must be a str"""
+    if not text:
+        return 0
+    # One C-level pass drops '$', ',', ' mi', 'K', etc.; int() skips the float round-trip
+    cleaned = text.translate(NUMERIC_CHARS_TABLE)
+    try:
+        return int(cleaned) if '.' not in cleaned else int(float(cleaned))
+    except ValueError:
+        return 0
+
+
+class ResultsCache:
+    """
+    On-disk cache of scrape results, one JSON file per key under directory.
+
+    Entries older than ttl seconds (empty_ttl for an empty result list) are
+    misses; a ttl of 0 or less disables the cache. Files are written then
+    renamed, so concurrent scraper processes can share the directory.
+    """
+
+    def __init__(self, directory: Path, ttl: int, empty_ttl: Optional[int] = None, label: str = ''):
+        self.directory = directory
+        self.ttl = ttl
+        self.empty_ttl = ttl if empty_ttl is None else empty_ttl
+        # Log prefix, e.g. '[CarMax] '
+        self.label = label
+
+    def load(self, key: str, max_results: int) -> Optional[List[Dict]]:
+        """Return fresh cached results for key, or None on a miss."""
+        if self.ttl <= 0:
+            return None
+        try:
+            raw = (self.directory / f"{key}.json").read_bytes()
+            entry = json_loads(raw)
+        except (OSError, ValueError):
+            return None
+        ttl = self.ttl if entry['results'] else self.empty_ttl
+        if time.time() - entry['stored_at'] > ttl:
+            return None
+        # A scrape capped at fewer results can't answer a bigger request
+        if entry['results'] and entry['max_results'] < max_results:
+            return None
+        return entry['results'][:max_results]
+
+    def store(self, key: str, max_results: int, results: Optional[List[Dict]]) -> None:
+        """Cache a scrape's results; None and error results are skipped, write failures logged."""
+        if self.ttl <= 0 or results is None:
+            return
+        if results and 'error' in results[0]:
+            return
+        entry = {'stored_at': time.time(), 'max_results': max_results, 'results': results}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            payload = json_dumps(entry)
+            # Write then rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.directory / f"{key}.json")
+        except OSError as e:
+            logging.error(f"{self.label}Could not write results cache: {e}")
+
+
+async def serve_jsonl(scrape: Callable[[dict], Awaitable[List[Dict]]], concurrency: Optional[int] = None) -> None:
+    """
+    Answer JSON-lines scrape requests from stdin until it closes (--serve mode).
+
+    Each stdin line is one JSON request object carrying an optional "id";
+    scrape(request) is awaited for it and one JSON line is written back,
+    {"id": ..., "results": <its return value>} or {"id": ..., "error": "..."}
+    if it raised. Requests run concurrently, so responses may arrive out of
+    order; with `concurrency` set, at most that many scrapes run at once.
+    Returns once every request read has been answered.
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    loop = asyncio.get_running_loop()
+
+    async def handle(request: dict):
+        response = {"id": request.get("id")}
+        try:
+            if semaphore is None:
+                response["results"] = await scrape(request)
+            else:
+                async with semaphore:
+                    response["results"] = await scrape(request)
+        except Exception as e:
+            response["error"] = str(e)
+        print(json.dumps(response))
+        sys.stdout.flush()
+
+    tasks = set()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(json.dumps({"id": None, "error": f"Invalid request: {e}"}))
+            sys.stdout.flush()
+            continue
+        if not isinstance(request, dict):
+            print(json.dumps({"id": None, "error": "Invalid request: expected a JSON object"}))
+            sys.stdout.flush()
+            continue
+        task = asyncio.create_task(handle(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test the CarMax tile parser and search cache key.
+
+parse_tile_row gets rows shaped like TILE_ROWS_JS output; canonical_key gets
+search URLs that should, and should not, share a cache entry.
+"""
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from carmax_core import canonical_key, parse_tile_row
+
+
+def test_parse_tile_row() -> bool:
+    """Rows read from the page in one call turn into listings without going back to the browser."""
+    print("\n🔍 parse_tile_row")
+    passed = True
+
+    # Full tile: clickprops give price and stock number, the link text the trim
+    listing = parse_tile_row({
+        'clickprops': 'Element type: Car Tile,StockNumber: 27818903,YMM: 2018 Honda Civic,Price: 14998',
+        'nameText': '2018 Honda Civic EX',
+        'location': None,
+        'linkText': '2018 Honda Civic EX\n$14,998',
+        'href': '/car/27818903',
+        'priceText': '$14,998*\n113K mi',
+        'image': 'https://img2.carmax.com/a.jpg',
+    }, 'honda civic')
+    expected = {
+        'name': '2018 Honda Civic EX',
+        'price': 14998,
+        'mileage': 113000,
+        'image': 'https://img2.carmax.com/a.jpg',
+        'retailer': 'CarMax',
+        'url': 'https://www.carmax.com/car/27818903',
+        'location': 'CarMax',
+    }
+    if listing == expected:
+        print("  ✅ Clickprops tile with '113K mi'")
+    else:
+        print(f"  ❌ Clickprops tile: expected {expected}, got {listing}")
+        passed = False
+
+    # The store in clickprops wins over the location the page matched
+    listing = parse_tile_row({
+        'clickprops': 'StockNumber: 1,YMM: 2020 Toyota Camry,Price: 21500,StoreName: Serramonte,StoreState: CA',
+        'nameText': None,
+        'location': ['Colma', 'CA'],
+        'linkText': None,
+        'href': None,
+        'priceText': '$21,500\n850 mi',
+        'image': None,
+    }, 'toyota camry')
+    if listing and (listing['location'], listing['mileage']) == ('CarMax Serramonte, CA', 850):
+        print("  ✅ Clickprops store and plain mileage")
+    else:
+        print(f"  ❌ Clickprops store and plain mileage: got {listing}")
+        passed = False
+
+    # Without a store in clickprops, the page-matched location is used
+    listing = parse_tile_row({
+        'clickprops': 'StockNumber: 2,YMM: 2020 Toyota Camry,Price: 21500',
+        'nameText': None,
+        'location': ['Colma', 'CA'],
+        'linkText': None,
+        'href': None,
+        'priceText': None,
+        'image': None,
+    }, 'toyota camry')
+    if listing and (listing['location'], listing['mileage']) == ('CarMax Colma, CA', 0):
+        print("  ✅ Row location, no price text")
+    else:
+        print(f"  ❌ Row location, no price text: got {listing}")
+        passed = False
+
+    # Tiles without a price are dropped
+    for label, clickprops in (('no clickprops', ''), ('zero price', 'StockNumber: 3,YMM: 2019 Kia Soul,Price: 0')):
+        listing = parse_tile_row({
+            'clickprops': clickprops,
+            'nameText': '2019 Kia Soul',
+            'location': None,
+            'linkText': '2019 Kia Soul',
+            'href': '/car/3',
+            'priceText': '$0',
+            'image': None,
+        }, 'kia soul')
+        if listing is None:
+            print(f"  ✅ Dropped tile with {label}")
+        else:
+            print(f"  ❌ Tile with {label} should be dropped, got {listing}")
+            passed = False
+
+    return passed
+
+
+def test_canonical_key() -> bool:
+    """Equivalent search URLs share a cache key; different searches don't."""
+    print("\n🔍 canonical_key")
+    base = 'https://www.carmax.com/cars/honda/civic?year=2018-2020&mileage=50000'
+    base_key = canonical_key(base, 'honda civic')
+    passed = True
+
+    same = [
+        ('param order', 'https://www.carmax.com/cars/honda/civic?mileage=50000&year=2018-2020'),
+        ('host case', 'https://WWW.CarMax.com/cars/honda/civic?year=2018-2020&mileage=50000'),
+        ('trailing slash', 'https://www.carmax.com/cars/honda/civic/?year=2018-2020&mileage=50000'),
+        ('fragment', 'https://www.carmax.com/cars/honda/civic?year=2018-2020&mileage=50000#results'),
+        ('default params',
+         'https://www.carmax.com/cars/honda/civic?year=2018-2020&showreservedcars=false&price=-&mileage=50000'),
+    ]
+    for label, url in same:
+        if canonical_key(url, 'honda civic') == base_key:
+            print(f"  ✅ Same key despite {label}")
+        else:
+            print(f"  ❌ Different key for {label}: {url}")
+            passed = False
+
+    different = [
+        ('other filters', canonical_key('https://www.carmax.com/cars/honda/civic?year=2018-2021&mileage=50000',
+                                        'honda civic')),
+        # The search argument is the fallback listing name, so it is part of the key
+        ('other search argument', canonical_key(base, 'civic')),
+    ]
+    for label, key in different:
+        if key != base_key:
+            print(f"  ✅ New key for {label}")
+        else:
+            print(f"  ❌ Same key for {label}")
+            passed = False
+
+    return passed
+
+
+def main():
+    """Run the tests."""
+    print("=" * 60)
+    print("CarMax Core Test")
+    print("=" * 60)
+
+    results = [test_parse_tile_row(), test_canonical_key()]
+    success = all(results)
+
+    print(f"\n{'=' * 60}")
+    if success:
+        print("TEST PASSED ✅")
+    else:
+        print("TEST FAILED ❌")
+    print(f"{'=' * 60}")
+
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
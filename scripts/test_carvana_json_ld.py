@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test the Carvana JSON-LD listing parser.
+
+Feeds parse_json_ld_listings the kinds of schema.org blocks a results page
+can embed and checks the nesting, the field type guards and the
+make/model/trim filter.
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Import the scraper (hyphenated module name requires special handling)
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "scrape_carvana_interactive",
+    Path(__file__).parent / "scrape-carvana-interactive.py"
+)
+carvana_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(carvana_module)
+parse_json_ld_listings = carvana_module.parse_json_ld_listings
+
+
+def test_nesting() -> bool:
+    """Vehicles inside @graph, ItemList/ListItem and top-level arrays are all found."""
+    print("\n🔍 Nesting")
+    graph_block = json.dumps({
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "WebPage", "name": "Used GMC Sierra 3500"},
+            {
+                "@type": "ItemList",
+                "itemListElement": [
+                    {
+                        "@type": "ListItem",
+                        "position": 1,
+                        "item": {
+                            "@type": "Car",
+                            "name": "2022 GMC Sierra 3500 Denali",
+                            "offers": {"@type": "Offer", "price": 64995},
+                            "url": "/vehicle/1001",
+                        },
+                    },
+                ],
+            },
+        ],
+    })
+    array_block = json.dumps([
+        {"@type": ["Product", "Vehicle"], "name": "2021 GMC Sierra 3500 AT4", "offers": [{"price": 58990}]},
+    ])
+
+    results = parse_json_ld_listings([graph_block, array_block], 10)
+    names = [listing['name'] for listing in results]
+    expected = ["2022 GMC Sierra 3500 Denali", "2021 GMC Sierra 3500 AT4"]
+    if names != expected:
+        print(f"  ❌ Expected {expected}, got {names}")
+        return False
+    if results[0]['url'] != "https://www.carvana.com/vehicle/1001":
+        print(f"  ❌ Relative url not made absolute: {results[0]['url']}")
+        return False
+    print(f"  ✅ Found {len(results)} vehicles across @graph, ItemList and array blocks")
+    return True
+
+
+def test_type_guards() -> bool:
+    """Prices and mileage as numbers, strings or QuantitativeValue objects; odd names/urls are ignored."""
+    print("\n🔍 Type guards")
+    block = json.dumps([
+        {"@type": "Car", "name": "2022 GMC Sierra 3500 Denali", "offers": {"price": 64995}},
+        {"@type": "Car", "name": "2021 GMC Sierra 3500 Denali", "offers": {"price": "$61,500"}},
+        {
+            "@type": "Car",
+            "name": "2020 GMC Sierra 3500 Denali",
+            "offers": {"price": {"@type": "QuantitativeValue", "value": "55990"}, "url": "/vehicle/3003"},
+            "mileageFromOdometer": {"@type": "QuantitativeValue", "value": 24512, "unitCode": "SMI"},
+            # Non-string url falls back to the offer's url
+            "url": ["/vehicle/ignored"],
+            "image": {"@type": "ImageObject", "url": "https://cdn.carvana.com/3003.jpg"},
+        },
+        # Non-string name: kept out of the results rather than raising
+        {"@type": "Car", "name": {"@value": "2019 GMC Sierra 3500"}, "offers": {"price": 49990}},
+        # Boolean and missing prices mean no price
+        {"@type": "Car", "name": "2018 GMC Sierra 3500 Denali", "offers": {"price": True}},
+        {"@type": "Car", "name": "2017 GMC Sierra 3500 Denali", "offers": "call"},
+    ])
+
+    results = parse_json_ld_listings([block, "{not json"], 10)
+    prices = [listing['price'] for listing in results]
+    if prices != [64995, 61500, 55990]:
+        print(f"  ❌ Expected prices [64995, 61500, 55990], got {prices}")
+        return False
+    third = results[2]
+    checks = {
+        'mileage': (third['mileage'], 24512),
+        'url': (third['url'], "https://www.carvana.com/vehicle/3003"),
+        'image': (third['image'], "https://cdn.carvana.com/3003.jpg"),
+    }
+    for field, (actual, expected) in checks.items():
+        if actual != expected:
+            print(f"  ❌ {field}: expected {expected!r}, got {actual!r}")
+            return False
+    print("  ✅ Number, string and QuantitativeValue prices parsed; bad names, prices and blocks skipped")
+    return True
+
+
+def test_make_model_trim_filter() -> bool:
+    """Only vehicles naming the make, the model and one of the trims are kept."""
+    print("\n🔍 Make/model/trim filter")
+    block = json.dumps([
+        {"@type": "Car", "name": "2022 GMC Sierra 3500HD Denali", "offers": {"price": 64995}},
+        {"@type": "Car", "name": "2022 GMC Sierra 3500HD AT4", "offers": {"price": 62995}},
+        {"@type": "Car", "name": "2022 GMC Sierra 2500HD Denali", "offers": {"price": 59995}},
+        {"@type": "Car", "name": "2023 Ram 3500 Limited", "offers": {"price": 71995}},
+    ])
+
+    cases = [
+        ("make and model", {'required': ['GMC', 'Sierra 3500']},
+         ["2022 GMC Sierra 3500HD Denali", "2022 GMC Sierra 3500HD AT4"]),
+        ("make, model and trim", {'required': ['GMC', 'Sierra 3500'], 'trims': ['Denali']},
+         ["2022 GMC Sierra 3500HD Denali"]),
+        ("any of several trims", {'required': ['gmc', 'sierra-3500'], 'trims': ['Denali Ultimate', 'AT4']},
+         ["2022 GMC Sierra 3500HD AT4"]),
+        ("no match", {'required': ['Ford', 'F-350']}, []),
+    ]
+
+    passed = True
+    for label, kwargs, expected in cases:
+        names = [listing['name'] for listing in parse_json_ld_listings([block], 10, **kwargs)]
+        if names == expected:
+            print(f"  ✅ {label}")
+        else:
+            print(f"  ❌ {label}: expected {expected}, got {names}")
+            passed = False
+
+    capped = parse_json_ld_listings([block], 1, ['GMC'])
+    if len(capped) != 1:
+        print(f"  ❌ max_results=1 returned {len(capped)} listings")
+        passed = False
+    return passed
+
+
+def main():
+    """Run the tests."""
+    print("=" * 60)
+    print("Carvana JSON-LD Parser Test")
+    print("=" * 60)
+
+    results = [test_nesting(), test_type_guards(), test_make_model_trim_filter()]
+    success = all(results)
+
+    print(f"\n{'=' * 60}")
+    if success:
+        print("TEST PASSED ✅")
+    else:
+        print("TEST FAILED ❌")
+    print(f"{'=' * 60}")
+
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
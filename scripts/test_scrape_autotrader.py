@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the AutoTrader link-row parser and listing emission.
+
+parse_listing_row gets rows shaped like LISTING_ROWS_JS output;
+collect_listings is checked to hand each listing to on_listing before the
+next row is parsed, and to stop parsing at max_results.
+"""
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Import the scraper (hyphenated module name requires special handling)
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "scrape_autotrader",
+    Path(__file__).parent / "scrape-autotrader.py"
+)
+autotrader_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(autotrader_module)
+parse_listing_row = autotrader_module.parse_listing_row
+collect_listings = autotrader_module.collect_listings
+
+
+def test_parse_listing_row() -> bool:
+    """Link rows turn into listings; non-vehicle and unpriced links are dropped."""
+    print("\n🔍 parse_listing_row")
+    passed = True
+
+    listing = parse_listing_row({
+        'href': '/cars-for-sale/vehicle/712345678#listing',
+        'title': 'Used 2022 GMC Sierra 3500 Denali',
+        'text': 'Used 2022 GMC Sierra 3500 Denali\n24,512 mi\n$64,995\nSee payment',
+        'image': 'https://images.autotrader.com/a.jpg',
+    })
+    expected = {
+        'name': 'Used 2022 GMC Sierra 3500 Denali',
+        'price': 64995,
+        # Comma-grouped mileage is read whole, not as the trailing "512"
+        'mileage': 24512,
+        'image': 'https://images.autotrader.com/a.jpg',
+        'retailer': 'AutoTrader',
+        'url': 'https://www.autotrader.com/cars-for-sale/vehicle/712345678',
+        'location': 'AutoTrader',
+    }
+    if listing == expected:
+        print("  ✅ Priced link row")
+    else:
+        print(f"  ❌ Priced link row: expected {expected}, got {listing}")
+        passed = False
+
+    # No "$": the first comma-grouped number in a plausible price range wins
+    listing = parse_listing_row({
+        'href': 'https://www.autotrader.com/cars-for-sale/vehicle/1#x',
+        'title': 'Used 2021 Ford F-350 Lariat',
+        'text': 'Used 2021 Ford F-350 Lariat\nStock 1,234\nNow 58,500 delivered',
+        'image': '',
+    })
+    actual = listing and (listing['price'], listing['mileage'], listing['url'])
+    expected = (58500, 0, 'https://www.autotrader.com/cars-for-sale/vehicle/1')
+    if actual == expected:
+        print("  ✅ Fallback price and absolute url")
+    else:
+        print(f"  ❌ Fallback price and absolute url: expected {expected}, got {actual}")
+        passed = False
+
+    dropped = [
+        ('short title', {'href': '/cars-for-sale/vehicle/2', 'title': 'Details', 'text': '$64,995', 'image': ''}),
+        ('no price', {'href': '/cars-for-sale/vehicle/3', 'title': 'Used 2022 GMC Sierra 3500 Denali',
+                      'text': 'Used 2022 GMC Sierra 3500 Denali\nCall for price', 'image': ''}),
+    ]
+    for label, row in dropped:
+        listing = parse_listing_row(row)
+        if listing is None:
+            print(f"  ✅ Dropped link with {label}")
+        else:
+            print(f"  ❌ Link with {label} should be dropped, got {listing}")
+            passed = False
+
+    return passed
+
+
+def test_collect_listings() -> bool:
+    """Listings are emitted as rows are parsed, and parsing stops at max_results."""
+    print("\n🔍 collect_listings")
+    passed = True
+    events = []
+
+    def parse_rows():
+        for name in ('a', None, 'b', 'c'):
+            events.append(f"parse {name}")
+            yield {'name': name, 'price': 1} if name else None
+
+    results = collect_listings(parse_rows(), 2, lambda listing: events.append(f"emit {listing['name']}"))
+
+    names = [listing['name'] for listing in results]
+    if names == ['a', 'b']:
+        print("  ✅ Skipped the unparsed row and stopped at max_results")
+    else:
+        print(f"  ❌ Expected ['a', 'b'], got {names}")
+        passed = False
+
+    expected = ['parse a', 'emit a', 'parse None', 'parse b', 'emit b']
+    if events == expected:
+        print("  ✅ Each listing emitted before the next row was parsed; row 'c' never parsed")
+    else:
+        print(f"  ❌ Expected events {expected}, got {events}")
+        passed = False
+
+    return passed
+
+
+def main():
+    """Run the tests."""
+    print("=" * 60)
+    print("AutoTrader Parser Test")
+    print("=" * 60)
+
+    results = [test_parse_listing_row(), test_collect_listings()]
+    success = all(results)
+
+    print(f"\n{'=' * 60}")
+    if success:
+        print("TEST PASSED ✅")
+    else:
+        print("TEST FAILED ❌")
+    print(f"{'=' * 60}")
+
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
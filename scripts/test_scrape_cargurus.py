@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test the CarGurus listing row parser and results cache key.
+
+parse_listing_row gets card text shaped like LISTING_ROWS_JS output and is
+checked against the module-level price, mileage, location and trim patterns;
+filters_cache_key gets filter sets that should, and should not, share an entry.
+"""
+import sys
+from pathlib import Path
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Import the scraper (hyphenated module name requires special handling)
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "scrape_cargurus",
+    Path(__file__).parent / "scrape-cargurus.py"
+)
+cargurus_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cargurus_module)
+parse_listing_row = cargurus_module.parse_listing_row
+filters_cache_key = cargurus_module.filters_cache_key
+
+
+def test_parse_listing_row() -> bool:
+    """Each field comes from its precompiled pattern over the card text."""
+    print("\n🔍 parse_listing_row")
+    passed = True
+
+    listing = parse_listing_row({
+        'text': '2022 GMC Sierra 3500HD Denali\n$64,995\n24,512 mi\nSan Mateo, CA',
+        'heading': '2022 GMC Sierra 3500HD Denali ',
+        'href': '/Cars/inventorylisting/vdp.action?listingId=123',
+        'image': 'https://static.cargurus.com/a.jpg',
+    }, 'GMC Sierra')
+    expected = {
+        'name': '2022 GMC Sierra 3500HD Denali',
+        'price': 64995,
+        'mileage': 24512,
+        'trim': 'Denali',
+        'image': 'https://static.cargurus.com/a.jpg',
+        'retailer': 'CarGurus',
+        'url': 'https://www.cargurus.com/Cars/inventorylisting/vdp.action?listingId=123',
+        'location': 'San Mateo, CA',
+    }
+    if listing == expected:
+        print("  ✅ Full card")
+    else:
+        print(f"  ❌ Full card: expected {expected}, got {listing}")
+        passed = False
+
+    # No heading, image or location; "miles" spelled out; trim detection off
+    listing = parse_listing_row({
+        'text': 'Denali · $41,000 · 12,000 miles',
+        'heading': None,
+        'href': 'https://www.cargurus.com/details/456',
+        'image': None,
+    }, 'GMC Sierra', detect_trim=False)
+    actual = (listing['name'], listing['price'], listing['mileage'], listing['trim'],
+              listing['image'], listing['location'], listing['url'])
+    expected = ('GMC Sierra', 41000, 12000, '', '', 'Unknown', 'https://www.cargurus.com/details/456')
+    if actual == expected:
+        print("  ✅ Sparse card falls back to defaults")
+    else:
+        print(f"  ❌ Sparse card: expected {expected}, got {actual}")
+        passed = False
+
+    # Mileage alone is enough to keep a card; neither price nor mileage drops it
+    listing = parse_listing_row({'text': 'Call for price\n8,000 mi', 'heading': 'GMC Sierra', 'href': None, 'image': None},
+                                'GMC Sierra')
+    if listing and (listing['price'], listing['mileage']) == (0, 8000):
+        print("  ✅ Unpriced card with mileage kept")
+    else:
+        print(f"  ❌ Unpriced card with mileage: got {listing}")
+        passed = False
+
+    listing = parse_listing_row({'text': 'Sponsored', 'heading': None, 'href': None, 'image': None}, 'GMC Sierra')
+    if listing is None:
+        print("  ✅ Card with neither price nor mileage dropped")
+    else:
+        print(f"  ❌ Card with neither price nor mileage should be dropped, got {listing}")
+        passed = False
+
+    return passed
+
+
+def test_filters_cache_key() -> bool:
+    """Equivalent filter sets share a cache key; different ones don't."""
+    print("\n🔍 filters_cache_key")
+    base_key = filters_cache_key({'make': 'GMC', 'model': 'Sierra 3500HD', 'yearMin': 2020})
+    passed = True
+
+    same = [
+        ('key order', {'yearMin': 2020, 'model': 'Sierra 3500HD', 'make': 'GMC'}),
+        ('make/model case', {'make': 'gmc', 'model': 'SIERRA 3500HD', 'yearMin': 2020}),
+        ('whitespace', {'make': ' GMC ', 'model': 'Sierra 3500HD\n', 'yearMin': 2020}),
+        ('default zip and distance',
+         {'make': 'GMC', 'model': 'Sierra 3500HD', 'yearMin': 2020, 'zip': 94002, 'distance': '200'}),
+    ]
+    for label, filters in same:
+        if filters_cache_key(filters) == base_key:
+            print(f"  ✅ Same key despite {label}")
+        else:
+            print(f"  ❌ Different key for {label}: {filters}")
+            passed = False
+
+    other_zip = filters_cache_key({'make': 'GMC', 'model': 'Sierra 3500HD', 'yearMin': 2020, 'zip': '10001'})
+    if other_zip != base_key:
+        print("  ✅ New key for another zip")
+    else:
+        print("  ❌ Same key for another zip")
+        passed = False
+
+    return passed
+
+
+def main():
+    """Run the tests."""
+    print("=" * 60)
+    print("CarGurus Parser Test")
+    print("=" * 60)
+
+    results = [test_parse_listing_row(), test_filters_cache_key()]
+    success = all(results)
+
+    print(f"\n{'=' * 60}")
+    if success:
+        print("TEST PASSED ✅")
+    else:
+        print("TEST FAILED ❌")
+    print(f"{'=' * 60}")
+
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())